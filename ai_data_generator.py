@@ -5,6 +5,7 @@ import os
 
 from common import Util
 from db_connect import PostgresDB
+from db_jobs import DbJobRunner
 
 class AiDataGenerator:
 
@@ -12,6 +13,7 @@ class AiDataGenerator:
         self.logging = logging
         self.setting = setting
         self.db_conn = PostgresDB(setting, logging)
+        self.jobs = DbJobRunner(setting, logging)
         self.cache_instrument_tokens = None
 
     def ce_pe_oi_ratio(self, row):
@@ -47,29 +49,34 @@ class AiDataGenerator:
     def determine_action(self, row):
         return 'No Trade'
 
-    def map_token_to_symbol(self, row):
-        token = row['token']
-        return self.cache_instrument_tokens[token]
-        
-        
     def generate_oi_difference(self, instrument_items):
+        output_file = 'oi_traning_data.csv'
+        if os.path.exists(output_file):
+            self.logging.error("Please the delete file 'traning_data.csv' first, Already exists")
+            return
+
         try:
             self.cache_instrument_tokens = instrument_items
             self.db_conn.connect()
-            query = """SELECT token, date, oi, last_price FROM tick_details where oi != 0 order by token, date;"""
-    
-            data_df = self.db_conn.get_records_in_data_frame(query)
-            
-            data_df['symbol'] = data_df.apply(self.map_token_to_symbol, axis=1)
-            data_df['oi_change'] = data_df['oi'].diff()
-            data_df['oi_change_ratio'] = round(data_df['oi'].pct_change() * 100, 2)
-
-            data_df = data_df[data_df['oi_change'] != 0.0]
-
-            if not os.path.exists('oi_traning_data.csv'):
-                data_df[['token', 'symbol', 'date', 'oi', 'oi_change', 'oi_change_ratio', 'last_price']].to_csv('oi_traning_data.csv', index=False)
-            else:
-                self.logging.error("Please the delete file 'traning_data.csv' first, Already exists")
+            # One row per token per 5-minute bar, the OI diffs run per token in Postgres
+            query = """
+                SELECT token, date, oi, oi_change, round(oi_change * 100.0 / NULLIF(oi - oi_change, 0), 2) AS oi_change_ratio, last_price
+                FROM (
+                    SELECT token, date, last_oi AS oi, last_oi - LAG(last_oi) OVER (PARTITION BY token ORDER BY unique_key) AS oi_change, last_price
+                    FROM tick_oi_5m
+                    WHERE last_oi != 0
+                ) bars
+                WHERE oi_change != 0
+                ORDER BY token, date
+            """
+            data_df = self.db_conn.copy_to_frame(query)
+            if data_df is None or data_df.empty:
+                self.logging.info(f"No OI changes to write to {output_file}")
+                return
+
+            data_df['symbol'] = data_df['token'].map(self.cache_instrument_tokens)
+            data_df[['token', 'symbol', 'date', 'oi', 'oi_change', 'oi_change_ratio', 'last_price']].to_csv(output_file, index=False)
+            self.logging.info(f"Written {len(data_df)} OI rows to {output_file}")
         except Exception as e:
             self.logging.error(f"Error in processing data for traning: {e}")
             self.logging.error(traceback.format_exc())
@@ -93,53 +100,38 @@ class AiDataGenerator:
 
     def generate(self, current_date, end_date):
         data_table = 'traning_data'
+        output_file = 'traning_data.csv'
     
         from_dt = datetime(current_date.year, current_date.month, current_date.day, 9, 15)
         to_dt   = datetime(end_date.year, end_date.month, end_date.day, 15, 30)
-    
-        try:
-            from_unique_key = Util.generate_5m_id(from_dt)
-            to_unique_key = Util.generate_5m_id(to_dt)
-    
-            self.db_conn.connect()
-    
-            query = """
+
+        if os.path.exists(output_file):
+            self.logging.error(f"Please delete the file '{output_file}' first. It already exists.")
+            return
+
+        # Derived ids and the per (date_id, strike_id) OI diffs are computed in Postgres
+        # with window functions and streamed straight to the CSV
+        query = """
+            SELECT *,
+                   nearest_pe_oi - LAG(nearest_pe_oi) OVER w AS nearest_pe_oi_diff,
+                   nearest_ce_oi - LAG(nearest_ce_oi) OVER w AS nearest_ce_oi_diff,
+                   next_pe_oi - LAG(next_pe_oi) OVER w AS next_pe_oi_diff,
+                   next_ce_oi - LAG(next_ce_oi) OVER w AS next_ce_oi_diff
+            FROM (
                 SELECT unique_key, date, trend, direction, signal, last_price, candle,
                        nearest_strike, nearest_pe_oi, nearest_ce_oi, nearest_pcr, nearest_gap,
-                       next_strike, next_pe_oi, next_ce_oi, next_pcr, next_gap
+                       next_strike, next_pe_oi, next_ce_oi, next_pcr, next_gap,
+                       (EXTRACT(YEAR FROM date) * 10000 + EXTRACT(MONTH FROM date) * 100 + EXTRACT(DAY FROM date))::bigint AS date_id,
+                       nearest_strike::text || '-' || next_strike::text AS strike_id,
+                       to_char(date, 'DD/MM/YYYY HH24:MI:SS') AS time
                 FROM %s
-            """ % data_table
-    
-            data_df = self.db_conn.get_records_in_data_frame(query)
-    
-            # Add derived columns
-            data_df['date_id'] = data_df.apply(lambda row: Util.generate_date_id(row["date"]), axis=1)
-            data_df['strike_id'] = data_df.apply(self.get_strike_id, axis=1)
-            data_df['time'] = data_df.apply(self.get_date_format, axis=1)
-    
-            # Sort before diff
-            data_df.sort_values(by=['date_id', 'strike_id', 'time'], inplace=True)
-    
-            # Calculate OI differences grouped by date_id and strike_id
-            oi_columns = ['nearest_pe_oi', 'nearest_ce_oi', 'next_pe_oi', 'next_ce_oi']
-            for col in oi_columns:
-                print(data_df.groupby(['date_id', 'strike_id'])[col])
-                data_df[col + '_diff'] = data_df.groupby(['date_id', 'strike_id'])[col].diff()
-    
-            # Write to CSV if not exists
-            output_file = 'traning_data.csv'
-            if not os.path.exists(output_file):
-                data_df.to_csv(output_file, index=False)
-            else:
-                self.logging.error(f"Please delete the file '{output_file}' first. It already exists.")
-    
-        except Exception as e:
-            self.logging.error(f"Error in processing data for training: {e}")
-            self.logging.error(traceback.format_exc())
-    
-        finally:
-            if self.db_conn is not None:
-                self.db_conn.close()
+                WHERE date >= %%s AND date <= %%s
+            ) data
+            WINDOW w AS (PARTITION BY date_id, strike_id ORDER BY time, date)
+            ORDER BY date_id, strike_id, time
+        """ % data_table
+
+        self.jobs.export_csv(query, output_file, (from_dt, to_dt))
 
 
     def encode_action(self, row):
@@ -189,21 +181,11 @@ class AiDataGenerator:
             self.logging.error(f"Wrong value added in direction column: {row['direction']}")
             return -1
 
-    def correct_date_format(self, row):
-        time = row['date']
-        if isinstance(time, str):
-            time = pd.to_datetime(time)
-
-        formatted_date = time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        return formatted_date
-        
-            
     def load_traning_data(self, csv):
         data_df = pd.read_csv(csv)
 
-        data_df["date"] = data_df.apply(self.correct_date_format, axis=1)
-        data_df["unique_key"] = data_df.apply(lambda row: Util.generate_5m_id(row["date"]), axis=1)
+        data_df["date"] = Util.to_datetimes(data_df["date"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+        data_df["unique_key"] = Util.generate_5m_ids(data_df["date"])
         data_df["direction"] = data_df.apply(self.encode_direction, axis=1)
         data_df["action"] = data_df.apply(self.encode_action, axis=1)
         data_df["state"] = data_df.apply(self.encode_state, axis=1)
@@ -266,10 +248,10 @@ class AiDataGenerator:
             query = """SELECT id, unique_key, date, time, direction, ce_pe_oi_ratio, prev_ce_pe_oi_ratio,
                         ce_beta, ce_oi_change, pre_ce_oi_change,
                         pe_beta, pe_oi_change, pre_pe_oi_change, state, action FROM %s
-            where unique_key >= %s order by id
-            """ % (data_table, from_unique_key)
+            where unique_key >= %%s order by id
+            """ % data_table
             
-            df = self.db_conn.get_records_in_data_frame(query)
+            df = self.db_conn.copy_to_frame(query, (from_unique_key,))
 
             return df
         except Exception as e:
@@ -300,89 +282,32 @@ class AiDataGenerator:
         
         return False
 
-    def copy_to_tick_details_copy(self):
+    def copy_to_tick_details_copy(self, from_dt = None, to_dt = None, batch_size = 500000):
         from_data_table = 'tick_details'
         to_data_table = 'tick_details_copy'
-        
-        try: 
-            self.db_conn.connect()
-            
-            query = """SELECT * FROM %s ORDER BY id ASC""" % from_data_table
-        
-            data_df = self.db_conn.get_records_in_data_frame(query)
-        
-            self.logging.info(f"fetched Data length: {len(data_df)}")
-         
-            columns_order = ['token', 'unique_key', 'date', 'last_price', 'oi', 'volume_traded', 'bid_volume', 'offer_volume']
-        
-            sorted_df = data_df[columns_order]
-        
-            self.logging.info(f"Data length : {len(sorted_df)}")
-        
-            query = """INSERT INTO %s(token, unique_key, date, last_price, oi, volume_traded, bid_volume, offer_volume) VALUES %%s""" % (to_data_table)
-        
-            # Convert DataFrame to tuples for bulk insert
-            tuples = [tuple(x) for x in sorted_df.to_numpy()]
-        
-            # Insert data using a bulk insert method
-            self.db_conn.insert_bulk_data(query, tuples)
-        
-            # Commit transaction
-            self.db_conn.commit()
-        
-            return True
-        except Exception as e:
-            self.logging.error(f"Error in processing data for traning: {e}")
-        finally:
-            if self.db_conn is not None:
-                self.db_conn.close()
-        
-        return None
+        columns_order = ['token', 'unique_key', 'date', 'last_price', 'oi', 'volume_traded', 'bid_volume', 'offer_volume']
+
+        # Runs as INSERT ... SELECT in id batches, re-running over the same range is a no-op
+        copied = self.jobs.insert_select(
+            to_data_table, columns_order, from_data_table, from_dt = from_dt, to_dt = to_dt,
+            batch_size = batch_size, conflict_columns = ['token', 'date']
+        )
+        return True if copied is not None else None
          
-    def copy_to_traning_table(self):
+    def copy_to_traning_table(self, from_dt = None, to_dt = None, batch_size = 500000):
         from_data_table = 'processed_details'
         to_data_table = 'traning_data'
-        
-        try: 
-            self.db_conn.connect()
-            
-            query = """SELECT * FROM %s""" % from_data_table
-    
-            data_df = self.db_conn.get_records_in_data_frame(query)
-
-            self.logging.info(f"fetched Data length: {len(data_df)}")
-
-            columns_order = [
+        columns_order = [
             'unique_key', 'date', 'trend', 'direction', 'signal', 'last_price', 'candle',
             'nearest_strike', 'nearest_pe_oi', 'nearest_ce_oi', 'nearest_pcr', 'nearest_gap',
             'next_strike', 'next_pe_oi', 'next_ce_oi', 'next_pcr', 'next_gap'
-            ]
-        
-            sorted_df = data_df.sort_values(by=['date'])[columns_order]
-
-            self.logging.info(f"Data length : {len(sorted_df)}")
-    
-            query = """INSERT INTO %s(unique_key, date, trend, direction, signal, last_price, candle,
-                            nearest_strike, nearest_pe_oi, nearest_ce_oi, nearest_pcr, nearest_gap,
-                            next_strike, next_pe_oi, next_ce_oi, next_pcr, next_gap) VALUES %%s""" % (to_data_table)
-
-            # Convert DataFrame to tuples for bulk insert
-            tuples = [tuple(x) for x in sorted_df.to_numpy()]
-    
-            # Insert data using a bulk insert method
-            self.db_conn.insert_bulk_data(query, tuples)
-    
-            # Commit transaction
-            self.db_conn.commit()
+        ]
 
-            return True
-        except Exception as e:
-            self.logging.error(f"Error in processing data for traning: {e}")
-        finally:
-            if self.db_conn is not None:
-                self.db_conn.close()
-        
-        return None
+        copied = self.jobs.insert_select(
+            to_data_table, columns_order, from_data_table, from_dt = from_dt, to_dt = to_dt,
+            batch_size = batch_size, order_by = 'date'
+        )
+        return True if copied is not None else None
 
     def fetch_ticks(self, date):
         data_table = 'tick_details_copy'
@@ -393,14 +318,14 @@ class AiDataGenerator:
         try:
             self.db_conn.connect()
     
-            query = f"""
+            query = """
                 SELECT id, token, date, last_price, oi, volume_traded 
                 FROM %s
-                WHERE date >= '%s' AND date <= '%s'
+                WHERE date >= %%s AND date <= %%s
                 ORDER BY id
-            """ % (data_table, from_dt, to_dt)
+            """ % data_table
             
-            df = self.db_conn.get_records_in_data_frame(query)
+            df = self.db_conn.copy_to_frame(query, (from_dt, to_dt))
             return df
     
         except Exception as e:
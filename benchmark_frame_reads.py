@@ -0,0 +1,72 @@
+#!/Users/grajwade/vPython/bin/python
+
+# Compares DataFrame read paths on a temporary tick-shaped table:
+# pd.read_sql (get_records_in_data_frame) against COPY TO STDOUT (copy_to_frame).
+# Usage: python benchmark_frame_reads.py [rows] [repeat]
+
+import sys
+import time
+import logging
+import warnings
+import numpy as np
+
+from settings import Setting
+from db_connect import PostgresDB
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO,
+	format="%(asctime)s[%(levelname)s] - %(message)s")
+
+warnings.filterwarnings("ignore")
+
+rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+setting = Setting()
+db = PostgresDB(setting, logging)
+if db.connect() is None:
+    logging.error("Unable to connect to the database")
+    exit()
+
+logging.info(f"Creating {rows} benchmark rows")
+db.cur.execute("""
+    CREATE TEMP TABLE frame_read_bench AS
+    SELECT id,
+           (256265 + id %% 40)::bigint AS token,
+           (202501010915 + id %% 75)::bigint AS unique_key,
+           TIMESTAMP '2025-01-01 09:15:00' + id * INTERVAL '1 second' AS date,
+           (20000 + (id %% 1000) / 7.0)::DECIMAL(10, 4) AS last_price,
+           (1000000 + id %% 5000)::bigint AS oi,
+           (id * 3)::bigint AS volume_traded
+    FROM generate_series(1, %s) AS id
+""", (rows,))
+
+query = "SELECT id, token, unique_key, date, last_price, oi, volume_traded FROM frame_read_bench ORDER BY id"
+
+def measure(read):
+    timings = []
+    df = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        df = read()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), df
+
+read_sql_seconds, read_sql_df = measure(lambda: db.get_records_in_data_frame(query))
+copy_seconds, copy_df = measure(lambda: db.copy_to_frame(query))
+
+print(f"{'path':<28}{'best (s)':>10}{'rows/s':>14}")
+print(f"{'pd.read_sql':<28}{read_sql_seconds:>10.3f}{rows / read_sql_seconds:>14,.0f}")
+print(f"{'COPY TO STDOUT':<28}{copy_seconds:>10.3f}{rows / copy_seconds:>14,.0f}")
+print(f"speedup: {read_sql_seconds / copy_seconds:.1f}x")
+
+print("dtypes (read_sql): ", dict(read_sql_df.dtypes.astype(str)))
+print("dtypes (copy):     ", dict(copy_df.dtypes.astype(str)))
+
+same = all(
+    np.allclose(read_sql_df[column].to_numpy(dtype = float), copy_df[column].to_numpy(dtype = float))
+    if column != 'date' else (read_sql_df[column].to_numpy() == copy_df[column].to_numpy()).all()
+    for column in read_sql_df.columns
+)
+print(f"same values: {same}")
+
+db.close()
@@ -0,0 +1,56 @@
+#!/Users/grajwade/vPython/bin/python
+
+# Compares the loop based calculate_rma/atr against the NumPy rma/ema/average_true_range
+# on a synthetic random-walk candle frame.
+# Usage: python benchmark_indicators.py [rows] [repeat]
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from moving_averages import calculate_rma, atr, rma, ema, true_range, average_true_range
+
+rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+period = 14
+
+rng = np.random.default_rng(0)
+close = np.round(20000 + np.cumsum(rng.integers(-40, 41, rows) * 0.05), 2)
+df = pd.DataFrame({
+    'open': close,
+    'high': np.round(close + rng.integers(0, 60, rows) * 0.05, 2),
+    'low': np.round(close - rng.integers(0, 60, rows) * 0.05, 2),
+    'close': close
+})
+tr = pd.Series(true_range(df))
+
+def measure(run, times = repeat):
+    timings = []
+    result = None
+    for _ in range(times):
+        started_at = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), result
+
+# The loop versions take seconds at 1M rows, one run is enough
+old_rma_seconds, old_rma = measure(lambda: calculate_rma(tr, period), 1)
+new_rma_seconds, new_rma = measure(lambda: rma(tr, period))
+old_atr_seconds, old_atr = measure(lambda: atr(df.copy(), period), 1)
+new_atr_seconds, new_atr = measure(lambda: average_true_range(df, period))
+old_ema_seconds, old_ema = measure(lambda: df['close'].ewm(span = period, adjust = False).mean().to_numpy())
+new_ema_seconds, new_ema = measure(lambda: ema(df['close'], period))
+
+print(f"{'indicator':<36}{'best (s)':>10}{'rows/s':>16}")
+for name, seconds in [('calculate_rma', old_rma_seconds), ('rma', new_rma_seconds),
+                      ('atr', old_atr_seconds), ('average_true_range', new_atr_seconds),
+                      ('ewm(adjust=False)', old_ema_seconds), ('ema', new_ema_seconds)]:
+    print(f"{name:<36}{seconds:>10.4f}{rows / seconds:>16,.0f}")
+print(f"rma speedup: {old_rma_seconds / new_rma_seconds:.0f}x, atr speedup: {old_atr_seconds / new_atr_seconds:.0f}x")
+
+# The loop versions round every step, so they drift from the exact values by a few paise
+old_atr = np.array(old_atr, dtype = float)
+print(f"max |atr - average_true_range|: {np.nanmax(np.abs(old_atr - new_atr)):.4f}")
+print(f"max |ewm - ema|: {np.max(np.abs(old_ema - new_ema)):.2e}")
+print(f"same NaN padding: {np.array_equal(np.isnan(old_atr), np.isnan(new_atr))}")
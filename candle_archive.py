@@ -0,0 +1,110 @@
+import os
+import traceback
+from datetime import datetime
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+class CandleArchive:
+    """On-disk Arrow IPC copy of the candle tables, one file per token per month.
+
+    Files live at `<candle_archive_dir>/<table>/<token>/<YYYY-MM>.arrow` and are
+    written uncompressed so reads memory-map them instead of parsing. The
+    archive is optional: without pyarrow or a configured directory every call
+    is a no-op and callers stay on Postgres.
+    """
+
+    columns = ['date', 'open', 'high', 'low', 'close', 'unique_key', 'token']
+
+    def __init__(self, setting, logging):
+        self.logging = logging
+        self.root = setting.candle_archive_dir
+        self.enabled = pa is not None and bool(self.root)
+        if pa is not None:
+            self.schema = pa.schema([
+                ('date', pa.timestamp('us')),
+                ('open', pa.float64()),
+                ('high', pa.float64()),
+                ('low', pa.float64()),
+                ('close', pa.float64()),
+                ('unique_key', pa.int64()),
+                ('token', pa.int64())
+            ])
+
+    def path(self, table_name, token, month):
+        return os.path.join(self.root, table_name, str(token), f"{month:%Y-%m}.arrow")
+
+    def months(self, from_dt, to_dt):
+        month = datetime(from_dt.year, from_dt.month, 1)
+        while month <= to_dt:
+            yield month
+            month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+    def read_file(self, path):
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def write(self, table_name, token, df):
+        """Merge candles into the month files, newer rows win on the same unique_key."""
+        if not self.enabled or df is None or df.empty:
+            return False
+
+        try:
+            df = df[self.columns].copy()
+            df['date'] = pd.to_datetime(df['date'])
+            df['token'] = int(token)
+            # read_sql hands DECIMAL columns over as Decimal objects
+            df[['open', 'high', 'low', 'close']] = df[['open', 'high', 'low', 'close']].astype(float)
+            months = df['date'].dt.to_period('M')
+
+            for period, month_df in df.groupby(months):
+                path = self.path(table_name, token, period.to_timestamp())
+                if os.path.exists(path):
+                    month_df = pd.concat([self.read_file(path).to_pandas(), month_df], ignore_index = True)
+                month_df = month_df.drop_duplicates(subset = 'unique_key', keep = 'last').sort_values('unique_key')
+                table = pa.Table.from_pandas(month_df, schema = self.schema, preserve_index = False)
+
+                os.makedirs(os.path.dirname(path), exist_ok = True)
+                # Readers may still have the old file mapped, so swap it in atomically
+                with pa.OSFile(f"{path}.tmp", 'wb') as sink:
+                    with pa.ipc.new_file(sink, self.schema) as writer:
+                        writer.write_table(table)
+                os.replace(f"{path}.tmp", path)
+
+            return True
+        except Exception as e:
+            self.logging.error(f"Error archiving {table_name} candles for {token}: {e}")
+            self.logging.error(traceback.format_exc())
+        return False
+
+    def read(self, table_name, token, from_dt, to_dt, before_unique_key = None):
+        """Candles of `token` between the dates as a frame, None when nothing is archived."""
+        if not self.enabled:
+            return None
+
+        try:
+            tables = []
+            for month in self.months(from_dt, to_dt):
+                path = self.path(table_name, token, month)
+                if os.path.exists(path):
+                    tables.append(self.read_file(path))
+            if not tables:
+                return None
+
+            table = pa.concat_tables(tables)
+            mask = pc.and_(pc.greater_equal(table.column('date'), pa.scalar(from_dt, pa.timestamp('us'))),
+                           pc.less_equal(table.column('date'), pa.scalar(to_dt, pa.timestamp('us'))))
+            if before_unique_key is not None:
+                mask = pc.and_(mask, pc.less(table.column('unique_key'), before_unique_key))
+            df = table.filter(mask).to_pandas()
+            # Same dtype copy_to_frame gives the table reads
+            df['date'] = df['date'].astype('datetime64[ns]')
+            return df
+        except Exception as e:
+            self.logging.error(f"Error reading archived {table_name} candles for {token}: {e}")
+            self.logging.error(traceback.format_exc())
+        return None
@@ -0,0 +1,137 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from historical_cache import HistoricalCache
+
+class CandleBuilder:
+    """Builds 1m/5m OHLC candles per token from live ticks.
+
+    Candles are aligned to the 09:15 session start and kept in the same dict
+    shape as `kite.historical_data`, so callers can swap one for the other.
+    """
+
+    interval_minutes = {'minute': 1, '5minute': 5}
+
+    def __init__(self, logging, intervals = ('minute', '5minute'), max_bars = 400):
+        self.logging = logging
+        self.intervals = [(name, self.interval_minutes[name]) for name in intervals]
+        self.max_bars = max_bars
+        self.current = {}
+        self.bars = {}
+        self.bar_keys = {}
+        self.last_volume = {}
+        self.lock = threading.Lock()
+        self.stats = {'served': 0, 'repaired': 0, 'finalized': 0}
+
+    def bar_start(self, time, minutes):
+        anchor = datetime(time.year, time.month, time.day, 9, 15)
+        offset = int((time - anchor).total_seconds() // 60)
+        return anchor + timedelta(minutes = (offset // minutes) * minutes)
+
+    def update_ticks(self, ticks):
+        with self.lock:
+            for tick in ticks:
+                timestamp = tick.get('exchange_timestamp')
+                if timestamp is None:
+                    continue
+
+                token = tick['instrument_token']
+                price = tick['last_price']
+                volume = tick.get('volume_traded', 0)
+                time = datetime(timestamp.year, timestamp.month, timestamp.day, timestamp.hour, timestamp.minute, timestamp.second)
+
+                for name, minutes in self.intervals:
+                    self.add_tick((token, name), self.bar_start(time, minutes), price, volume)
+
+    def add_tick(self, key, start, price, volume):
+        bar = self.current.get(key)
+        if bar is not None and start < bar['date']:
+            return  # Late tick for a bar that is already closed
+
+        if bar is None or start > bar['date']:
+            if bar is not None:
+                self.finalize(key, bar)
+            open_volume = self.last_volume.get(key, volume)
+            bar = {
+                'date': start, 'open': price, 'high': price, 'low': price, 'close': price,
+                'volume': 0, 'open_volume': open_volume,
+                # The first bar seen for a token may have started before we subscribed
+                'partial': key not in self.current
+            }
+            self.current[key] = bar
+
+        bar['high'] = max(bar['high'], price)
+        bar['low'] = min(bar['low'], price)
+        bar['close'] = price
+        bar['volume'] = max(volume - bar['open_volume'], 0)
+        self.last_volume[key] = volume
+
+    def finalize(self, key, bar):
+        candle = {name: bar[name] for name in ['date', 'open', 'high', 'low', 'close', 'volume']}
+        self.store(key, candle, bar['partial'])
+        if not bar.get('closed'):
+            self.stats['finalized'] += 1
+
+    def store(self, key, candle, partial = False):
+        bars = self.bars.setdefault(key, {})
+        keys = self.bar_keys.setdefault(key, deque())
+        if candle['date'] not in bars:
+            keys.append(candle['date'])
+        bars[candle['date']] = (candle, partial)
+
+        while len(keys) > self.max_bars:
+            bars.pop(keys.popleft(), None)
+
+    def close_bars(self, time):
+        """Finalize every open bar that ended at or before `time`."""
+        with self.lock:
+            for key, bar in list(self.current.items()):
+                minutes = self.interval_minutes[key[1]]
+                if not bar.get('closed') and bar['date'] + timedelta(minutes = minutes) <= time:
+                    self.finalize(key, bar)
+                    bar['closed'] = True
+
+    def get_candles(self, token, from_dt, to_dt, interval = '5minute'):
+        """Closed candles in [from_dt, to_dt), or None when any bar is missing or partial."""
+        minutes = self.interval_minutes[interval]
+        count = int((to_dt - from_dt).total_seconds() // 60) // minutes
+        with self.lock:
+            bars = self.bars.get((token, interval), {})
+            candles = []
+            for i in range(count):
+                entry = bars.get(from_dt + timedelta(minutes = i * minutes))
+                if entry is None or entry[1]:
+                    return None
+                candles.append(dict(entry[0]))
+
+        self.stats['served'] += 1
+        return candles
+
+    def fetch_candles(self, kite_login, token, from_dt, to_dt, interval = '5minute'):
+        """Serve candles from memory, repairing gaps with one historical_data call."""
+        self.close_bars(to_dt)
+        candles = self.get_candles(token, from_dt, to_dt, interval)
+        if candles is not None:
+            return candles
+
+        data = HistoricalCache.shared(self.logging).fetch(kite_login, token, from_dt, to_dt, interval)
+        self.repair(token, interval, data)
+        return data
+
+    def repair(self, token, interval, candles):
+        key = (token, interval)
+        with self.lock:
+            current = self.current.get(key)
+            for candle in candles or []:
+                date = candle['date']
+                date = datetime(date.year, date.month, date.day, date.hour, date.minute)
+                # The bar still being built from ticks stays authoritative
+                if current is not None and date >= current['date'] and not current.get('closed'):
+                    continue
+                self.store(key, {
+                    'date': date, 'open': candle['open'], 'high': candle['high'],
+                    'low': candle['low'], 'close': candle['close'], 'volume': candle.get('volume', 0)
+                })
+            self.bar_keys[key] = deque(sorted(self.bars.get(key, {})))
+            self.stats['repaired'] += 1
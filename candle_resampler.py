@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from common import Util
+from historetical_data import HistoricalData
+
+class CandleResampler:
+    """Builds 15m/30m/1h candles out of 5m candles.
+
+    Buckets are anchored at the 09:15 session open, the same buckets
+    Util.generate_30m_id keys, and the last bucket of the day is cut at
+    the 15:30 close. A bucket is only emitted once its last 5m candle is
+    in, so partial bars never leak into the derived tables.
+    """
+
+    session_open = 9 * 60 + 15
+    session_close = 15 * 60 + 30
+
+    def __init__(self, setting, logging):
+        self.setting = setting
+        self.logging = logging
+
+    def bucket_starts(self, dates, minutes):
+        values = np.asarray(Util.parse_datetimes(dates), dtype = 'datetime64[m]')
+        days = values.astype('datetime64[D]')
+        offset = (values - days).astype(np.int64) - self.session_open
+        return days + (self.session_open + offset // minutes * minutes).astype('timedelta64[m]')
+
+    def resample(self, df, minutes, include_partial = False):
+        """5m candles (date, open, high, low, close[, token]) to `minutes` candles keyed like the tables."""
+        columns = ['date', 'open', 'high', 'low', 'close', 'unique_key', 'token']
+        if df is None or df.empty:
+            return pd.DataFrame(columns = columns)
+
+        df = df.sort_values('date')
+        starts = self.bucket_starts(df['date'], minutes)
+        frame = pd.DataFrame({
+            'bucket': starts,
+            'open': df['open'].to_numpy(dtype = float),
+            'high': df['high'].to_numpy(dtype = float),
+            'low': df['low'].to_numpy(dtype = float),
+            'close': df['close'].to_numpy(dtype = float),
+            'last': np.asarray(Util.parse_datetimes(df['date']), dtype = 'datetime64[m]'),
+            'token': df['token'].to_numpy() if 'token' in df else 0
+        })
+
+        candles = frame.groupby('bucket', sort = True).agg(
+            open = ('open', 'first'), high = ('high', 'max'), low = ('low', 'min'),
+            close = ('close', 'last'), last = ('last', 'max'), token = ('token', 'last'))
+
+        if not include_partial:
+            buckets = candles.index.to_numpy(dtype = 'datetime64[m]')
+            days = buckets.astype('datetime64[D]')
+            ends = np.minimum(buckets + np.timedelta64(minutes, 'm'), days + np.timedelta64(self.session_close, 'm'))
+            complete = candles['last'].to_numpy(dtype = 'datetime64[m]') + np.timedelta64(5, 'm') >= ends
+            candles = candles[complete]
+
+        candles = candles.reset_index().rename(columns = {'bucket': 'date'})
+        candles['date'] = candles['date'].astype('datetime64[ns]')
+        candles['unique_key'] = Util.generate_5m_ids(candles['date'])
+        return candles[columns]
+
+    def update(self, candles, df_5m, minutes, since):
+        """Replace the buckets touched by 5m candles from `since` onwards, e.g. after a live refresh."""
+        start = self.bucket_starts([since], minutes)[0]
+        recent = df_5m[np.asarray(Util.parse_datetimes(df_5m['date']), dtype = 'datetime64[m]') >= start]
+        derived = self.resample(recent, minutes)
+        if derived.empty:
+            return candles
+        if candles is None or candles.empty:
+            return derived
+
+        kept = candles[~candles['unique_key'].isin(derived['unique_key'])]
+        return pd.concat([kept, derived], ignore_index = True).sort_values('unique_key').reset_index(drop = True)
+
+    def derive(self, token, table_name, minutes = 30, generate_ids = Util.generate_30m_ids, current_time = None):
+        """Bulk: rebuild `table_name` from the 5m table, starting at the day of its latest stored bar."""
+        current_time = current_time or datetime.now()
+        h_data = HistoricalData(self.setting, token, self.logging)
+
+        last_unique_key = h_data.last_unique_key(table_name)
+        if last_unique_key is None:
+            from_dt = current_time - timedelta(days = self.setting.historical_retention_days)
+        else:
+            from_dt = datetime.strptime(str(last_unique_key // 10000), '%Y%m%d')
+        from_dt = datetime(from_dt.year, from_dt.month, from_dt.day)
+
+        candles = self.resample(h_data.load_5m_current_data(from_dt, current_time), minutes)
+        if candles.empty:
+            # Nothing new to derive is fine as long as the table already has bars
+            return last_unique_key is not None
+
+        saved = h_data.save_candles(candles, table_name, generate_ids)
+        self.logging.info(f"Derived {len(candles)} {minutes}m candles for {token} from 5m since {from_dt:%Y-%m-%d}")
+        return saved
@@ -1,6 +1,7 @@
 import re
 
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 
 class Util:
@@ -76,6 +77,17 @@ class Util:
                 to_dt.hour * 100 +
                 to_dt.minute)
 
+    @staticmethod
+    def trading_days(from_date, to_date, holidays = ()):
+        """Weekdays from `from_date` to `to_date` inclusive that are not in `holidays`."""
+        days = []
+        day = from_date
+        while day <= to_date:
+            if day.weekday() < 5 and day not in holidays:
+                days.append(day)
+            day = day + timedelta(days = 1)
+        return days
+
     @staticmethod
     def is_index_token(setting, token):
         return setting.get_security_by_token(token)['index']
@@ -93,4 +105,69 @@ class Util:
             time = pd.to_datetime(time)
             
         return datetime(time.year, time.month, time.day, time.hour, time.minute)
-        
\ No newline at end of file
+        
+
+    # Array counterparts of the id helpers above: they take a datetime Series,
+    # ndarray or list (strings included), parse it once and compute the keys
+    # with vector arithmetic. A Series comes back as a Series on the same index.
+
+    @staticmethod
+    def to_datetimes(times):
+        try:
+            return pd.to_datetime(times)
+        except ValueError:
+            # Mixed string formats, infer each one like the scalar helpers do
+            return pd.to_datetime(times, format = 'mixed')
+
+    @staticmethod
+    def datetime_fields(times):
+        parsed = Util.to_datetimes(times)
+        fields = parsed.dt if isinstance(parsed, pd.Series) else pd.DatetimeIndex(parsed)
+        index = parsed.index if isinstance(parsed, pd.Series) else None
+        return fields, index
+
+    @staticmethod
+    def wrap_ids(values, index):
+        values = np.asarray(values, dtype = np.int64)
+        return pd.Series(values, index = index) if index is not None else values
+
+    @staticmethod
+    def generate_date_ids(times):
+        fields, index = Util.datetime_fields(times)
+        return Util.wrap_ids(np.asarray(fields.year, dtype = np.int64) * 10000 +
+                             np.asarray(fields.month, dtype = np.int64) * 100 +
+                             np.asarray(fields.day, dtype = np.int64), index)
+
+    @staticmethod
+    def generate_5m_ids(times):
+        fields, index = Util.datetime_fields(times)
+        return Util.wrap_ids(np.asarray(fields.year, dtype = np.int64) * 100000000 +
+                             np.asarray(fields.month, dtype = np.int64) * 1000000 +
+                             np.asarray(fields.day, dtype = np.int64) * 10000 +
+                             np.asarray(fields.hour, dtype = np.int64) * 100 +
+                             np.asarray(fields.minute, dtype = np.int64) // 5 * 5, index)
+
+    @staticmethod
+    def generate_30m_ids(times):
+        naive = Util.parse_datetimes(times)
+        index = naive.index if isinstance(naive, pd.Series) else None
+        minutes = np.asarray(naive, dtype = 'datetime64[m]')
+        days = minutes.astype('datetime64[D]')
+        # Floor to the 30 minute bucket counted from 09:15; early hours fall back into the previous day
+        offset = (minutes - days).astype(np.int64) - 555
+        buckets = days + (555 + offset // 30 * 30).astype('timedelta64[m]')
+        return Util.wrap_ids(Util.generate_5m_ids(buckets), index)
+
+    @staticmethod
+    def parse_datetimes(times):
+        """Naive wall-clock datetimes truncated to the minute, like parse_datetime."""
+        parsed = Util.to_datetimes(times)
+        if isinstance(parsed, pd.Series):
+            if parsed.dt.tz is not None:
+                parsed = parsed.dt.tz_localize(None)
+            return parsed.dt.floor('min')
+
+        parsed = pd.DatetimeIndex(parsed)
+        if parsed.tz is not None:
+            parsed = parsed.tz_localize(None)
+        return np.asarray(parsed.floor('min'), dtype = 'datetime64[ns]')
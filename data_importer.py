@@ -5,6 +5,8 @@ import logging
 from datetime import datetime, timedelta
 
 from historetical_data import HistoricalData
+from historical_importer import HistoricalImporter
+from tick_partitions import TickPartitionManager
 from settings import Setting
 from kite_login import KiteLogin
 from common import Util
@@ -32,19 +34,25 @@ unique_key = Util.generate_5m_id(start_time)
 logging.info("Cleaning old records")
 
 h_data = HistoricalData(setting, "", logging)
-if not h_data.prepare(True):
+if not h_data.prepare(True, incremental = setting.historical_incremental):
     logging.error("Cleaning old records failed")
     exit()
 
+# Ticks are kept by day; roll partitions forward and expire old days instead of truncating
+if not TickPartitionManager(setting, logging).maintain():
+    logging.error("Tick partition maintenance failed")
+
+# Fetch every token's history concurrently, bounded by the historical API rate limit
+results = HistoricalImporter(setting, logging, kite_login).run(tokens)
+
 for token in tokens:
     h_data = HistoricalData(setting, token, logging)
-    # if h_data.sync_five_min_test_data(kite_login):
-    if h_data.is_data_synced(setting.table_name_5m) or h_data.sync_five_min_data(kite_login):
+    if results.get((token, '5minute')):
         logging.info(f"Synced 5min data for: {token}")
         if len(h_data.load_5min_data(unique_key)) > h_data.required_5m_data_count:
             logging.info(f"5min data ({len(h_data.data_5min)}) synced for: {token}")
         
-        if h_data.is_data_synced(setting.table_name_30m) or h_data.sync_thirty_min_data(kite_login):
+        if results.get((token, '30minute')):
             logging.info(f"Synced 30min data for: {token}")
             if len(h_data.load_30min_data()) > h_data.required_30m_data_count:
                 logging.info(f"30min data ({len(h_data.data_30min)}) synced for: {token}")
@@ -52,4 +60,3 @@ for token in tokens:
             logging.error(f"Failed to sync 30min data for: {token}")
     else:
         logging.error(f"Failed to sync 5min data for: {token}")
-    
\ No newline at end of file
@@ -1,13 +1,323 @@
+import io
+import math
+import itertools
+import zlib
+import time
+import struct
+import threading
 import psycopg2
 import pandas as pd
 import numpy as np
 import warnings
+from decimal import Decimal
+from datetime import datetime, date
 from psycopg2 import sql
 import psycopg2.extras as extras
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from contextlib import contextmanager
 
 warnings.filterwarnings("ignore")
 
+PG_EPOCH = datetime(2000, 1, 1)
+PG_EPOCH_DATE = date(2000, 1, 1)
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+
+# Result column type OID -> pandas dtype for COPY TO STDOUT reads
+COPY_READ_DTYPES = {
+    20: 'int64', 21: 'int64', 23: 'int64',
+    700: 'float64', 701: 'float64', 1700: 'float64',
+    16: 'bool',
+    1114: 'datetime64[ns]', 1082: 'datetime64[ns]'
+}
+
+def copy_text_value(value):
+    """Encode one value in COPY text format."""
+    if value is None or value is pd.NaT:
+        return '\\N'
+    if isinstance(value, (bool, np.bool_)):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, np.datetime64):
+        return '\\N' if np.isnat(value) else str(value).replace('T', ' ')
+
+    text = str(value)
+    if isinstance(value, str):
+        text = (text.replace('\\', '\\\\').replace('\t', '\\t')
+                    .replace('\n', '\\n').replace('\r', '\\r'))
+    return text
+
+def encode_numeric(value):
+    """Encode a number in the binary wire format of the NUMERIC type."""
+    value = value if isinstance(value, Decimal) else Decimal(str(value))
+    if not value.is_finite():
+        raise ValueError(f"Cannot COPY {value} into a numeric column")
+    sign, digits, exponent = value.as_tuple()
+    digits = ''.join(map(str, digits))
+    if exponent > 0:
+        digits, exponent = digits + '0' * exponent, 0
+
+    split = len(digits) + exponent
+    int_part = digits[:split] if split > 0 else ''
+    frac_part = digits[split:] if split >= 0 else '0' * -split + digits
+    int_part = int_part.zfill((len(int_part) + 3) // 4 * 4)
+    frac_part = frac_part.ljust((len(frac_part) + 3) // 4 * 4, '0')
+
+    groups = [int(int_part[i:i + 4]) for i in range(0, len(int_part), 4)]
+    weight = len(groups) - 1
+    groups += [int(frac_part[i:i + 4]) for i in range(0, len(frac_part), 4)]
+
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    header = struct.pack('>hhHh', len(groups), weight, 0x4000 if sign else 0, max(0, -exponent))
+    return header + struct.pack('>%dh' % len(groups), *groups)
+
+COPY_BINARY_ENCODERS = {
+    'int2': lambda v: struct.pack('>h', int(v)),
+    'int4': lambda v: struct.pack('>i', int(v)),
+    'int8': lambda v: struct.pack('>q', int(v)),
+    'float4': lambda v: struct.pack('>f', float(v)),
+    'float8': lambda v: struct.pack('>d', float(v)),
+    'bool': lambda v: b'\x01' if v else b'\x00',
+    'numeric': encode_numeric,
+    'timestamp': lambda v: struct.pack('>q', (pd.Timestamp(v).to_pydatetime() - PG_EPOCH) // pd.Timedelta(microseconds = 1)),
+    'date': lambda v: struct.pack('>i', (pd.Timestamp(v).date() - PG_EPOCH_DATE).days),
+    'text': lambda v: str(v).encode('utf-8'),
+    'varchar': lambda v: str(v).encode('utf-8'),
+}
+
+# Fixed-width types encoded straight from the column array, with their range for integers
+COPY_BINARY_DTYPES = {
+    'int2': ('>i2', np.iinfo(np.int16)), 'int4': ('>i4', np.iinfo(np.int32)), 'int8': ('>i8', np.iinfo(np.int64)),
+    'float4': ('>f4', None), 'float8': ('>f8', None), 'bool': ('u1', None),
+    'timestamp': ('>i8', None), 'date': ('>i4', None)
+}
+
+def is_copy_null(value):
+    return value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value))
+
+def encode_binary_column(series, type_name):
+    """Null mask, byte length of every non-null value and their concatenated payload."""
+    nulls = series.isna().to_numpy()
+    values = series[~nulls]
+
+    if type_name not in COPY_BINARY_DTYPES:
+        encode = COPY_BINARY_ENCODERS[type_name]
+        encoded = [encode(value) for value in values.tolist()]
+        return nulls, np.fromiter(map(len, encoded), dtype = np.int64, count = len(encoded)), b''.join(encoded)
+
+    dtype, limits = COPY_BINARY_DTYPES[type_name]
+    if type_name == 'timestamp':
+        data = (pd.to_datetime(values, cache = False).to_numpy(dtype = 'datetime64[us]') - np.datetime64(PG_EPOCH, 'us')).astype(np.int64)
+    elif type_name == 'date':
+        data = (pd.to_datetime(values, cache = False).to_numpy(dtype = 'datetime64[D]') - np.datetime64(PG_EPOCH_DATE, 'D')).astype(np.int64)
+    elif type_name == 'bool':
+        data = values.to_numpy(dtype = bool)
+    elif limits is not None:
+        data = values.to_numpy()
+        if data.dtype.kind == 'f':
+            # NaN was taken as NULL above, inf has no integer value
+            if not np.isfinite(data).all():
+                raise ValueError(f"Cannot COPY inf into an {type_name} column {series.name}")
+            data = np.trunc(data)
+        if len(data) and (data.min() < limits.min or data.max() > limits.max):
+            raise ValueError(f"Value out of {type_name} range in column {series.name}")
+        data = data.astype(np.int64)
+    else:
+        data = values.to_numpy(dtype = float)
+
+    data = data.astype(dtype)
+    return nulls, np.full(len(data), data.dtype.itemsize, dtype = np.int64), data.tobytes()
+
+def scatter(buffer, starts, widths, payload):
+    # Copy payload into buffer as consecutive runs of widths bytes at starts
+    if not len(payload):
+        return
+    run_starts = np.cumsum(widths) - widths
+    positions = np.repeat(starts - run_starts, widths) + np.arange(len(payload))
+    buffer[positions] = np.frombuffer(payload, dtype = np.uint8)
+
+class CopyStream(io.RawIOBase):
+    """Read-only file object that encodes COPY data lazily from a chunk iterator."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size = -1):
+        while size < 0 or len(self.buffer) - self.offset < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            # Drop what was already read once per chunk, not on every read
+            del self.buffer[:self.offset]
+            self.offset = 0
+            self.buffer += chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+        end = len(self.buffer) if size < 0 else min(self.offset + size, len(self.buffer))
+        data = bytes(self.buffer[self.offset:end])
+        self.offset = end
+        return data
+
+    def readline(self, size = -1):
+        return self.read(size)
+
+class ConnectionPool:
+    """Thread-safe pool of warm psycopg2 connections shared by every PostgresDB."""
+
+    def __init__(self, connect_args, logging, min_size = 1, max_size = 10, health_check_interval = 30, timeout = 30):
+        self.connect_args = connect_args
+        self.logging = logging
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.idle = []
+        self.size = 0
+        # Server-side prepared statement names per live connection
+        self.prepared = {}
+        self.stats = {
+            'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+            'created': 0, 'discarded': 0, 'health_checks': 0, 'timeouts': 0
+        }
+
+        for _ in range(min_size):
+            try:
+                self.idle.append((self.create(), time.monotonic()))
+                self.size += 1
+            except Exception as e:
+                self.logging.debug(f"❌ Error warming connection pool: {e}")
+                break
+
+    def create(self):
+        conn = psycopg2.connect(**self.connect_args)
+        self.stats['created'] += 1
+        return conn
+
+    def healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+
+        self.stats['health_checks'] += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout = None):
+        timeout = self.timeout if timeout is None else timeout
+        started_at = time.monotonic()
+        waited = False
+
+        with self.condition:
+            while True:
+                while self.idle:
+                    conn, idle_since = self.idle.pop()
+                    if self.healthy(conn, idle_since):
+                        return self.checked_out(conn, started_at, waited)
+                    self.discard(conn)
+
+                if self.size < self.max_size:
+                    # Reserve the slot so connecting can happen outside the lock
+                    self.size += 1
+                    break
+
+                remaining = timeout - (time.monotonic() - started_at)
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolError(f"No connection available within {timeout}s")
+                waited = True
+                self.condition.wait(remaining)
+
+        try:
+            conn = self.create()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            return self.checked_out(conn, started_at, waited)
+
+    def checked_out(self, conn, started_at, waited):
+        wait_seconds = time.monotonic() - started_at
+        self.stats['checkouts'] += 1
+        self.stats['wait_seconds'] += wait_seconds
+        self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], wait_seconds)
+        if waited:
+            self.stats['waits'] += 1
+        return conn
+
+    def putconn(self, conn):
+        with self.condition:
+            try:
+                if not conn.closed:
+                    # Never hand a half-finished transaction to the next caller
+                    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    conn.autocommit = False
+            except Exception:
+                pass
+
+            if conn.closed:
+                self.discard(conn)
+            else:
+                self.idle.append((conn, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, conn):
+        self.size -= 1
+        self.stats['discarded'] += 1
+        self.prepared.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats['size'] = self.size
+            stats['idle'] = len(self.idle)
+            stats['in_use'] = self.size - len(self.idle)
+            stats['avg_wait_seconds'] = stats['wait_seconds'] / stats['checkouts'] if stats['checkouts'] else 0.0
+            return stats
+
+    def close_all(self):
+        with self.condition:
+            while self.idle:
+                conn, _ = self.idle.pop()
+                self.discard(conn)
+
 class PostgresDB:
+    column_types_cache = {}
+    pools = {}
+    pools_lock = threading.Lock()
+    queries = {}
+    query_stats = {}
+    copy_read_dtypes_cache = {}
+    cursor_ids = itertools.count(1)
+    query_stats_lock = threading.Lock()
+
     def __init__(self, setting, logging):
         """Initialize the database connection."""
         self.db_name     = setting.db_name
@@ -18,26 +328,128 @@ class PostgresDB:
         self.conn        = None
         self.cur         = None
         self.logging     = logging
+        self.pool        = self.get_pool(setting, logging)
+
+    @classmethod
+    def get_pool(cls, setting, logging):
+        """One pool per database for the whole process."""
+        connect_args = {
+            'dbname': setting.db_name,
+            'user': setting.db_username,
+            'password': setting.db_password,
+            'host': setting.db_host,
+            'port': setting.db_port
+        }
+        key = tuple(sorted((name, str(value)) for name, value in connect_args.items()))
+
+        with cls.pools_lock:
+            if key not in cls.pools:
+                cls.pools[key] = ConnectionPool(
+                    connect_args, logging,
+                    min_size = setting.db_pool_min,
+                    max_size = setting.db_pool_max,
+                    health_check_interval = setting.db_pool_health_check
+                )
+            return cls.pools[key]
 
     def connect(self, auto = False):
-        """Establish a connection to the PostgreSQL database."""
-        try:
-            self.conn = psycopg2.connect(
-                dbname   = self.db_name,
-                user     = self.db_user,
-                password = self.db_password,
-                host     = self.db_host,
-                port     = self.db_port
-            )
+        """Check a connection out of the pool."""
+        if self.conn is not None:
+            return self.conn
+
+        try:
+            self.conn = self.pool.getconn()
             if auto:
                 self.conn.autocommit = True
             self.cur = self.conn.cursor()
             self.logging.debug("✅ Connected to PostgreSQL successfully!")
         except Exception as e:
             self.logging.debug(f"❌ Error connecting to the database: {e}")
+            self.release()
             return None
 
         return self.conn
+
+    @contextmanager
+    def checkout(self, auto = False):
+        """`with db.checkout():` connects, rolls back on error and always returns the connection."""
+        if self.connect(auto) is None:
+            raise psycopg2.OperationalError("Unable to connect to the database")
+        try:
+            yield self
+        except Exception:
+            self.rollback()
+            raise
+        finally:
+            self.close()
+
+    def get_pool_stats(self):
+        return self.pool.get_stats()
+
+    @classmethod
+    def register_query(cls, name, query, types):
+        """Register a hot statement; `query` uses $1..$n placeholders matching `types`."""
+        # The statement name carries a hash of the SQL so a changed query is prepared afresh
+        statement = f"{name}_{zlib.crc32(query.encode()):08x}"
+        cls.queries[name] = {
+            'statement': statement,
+            'prepare': f"PREPARE {statement} ({', '.join(types)}) AS {query}",
+            'execute': f"EXECUTE {statement} ({', '.join(['%s'] * len(types))})" if types else f"EXECUTE {statement}"
+        }
+        with cls.query_stats_lock:
+            cls.query_stats.setdefault(name, {'calls': 0, 'errors': 0, 'prepares': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+
+    def execute_prepared(self, name, params = ()):
+        """Run a registered statement on this connection, preparing it on first use."""
+        query = PostgresDB.queries[name]
+        prepared = self.pool.prepared.setdefault(id(self.conn), set())
+        started_at = time.monotonic()
+
+        try:
+            if query['statement'] not in prepared:
+                self.cur.execute(query['prepare'])
+                prepared.add(query['statement'])
+                self.record_query(name, 'prepares')
+            self.cur.execute(query['execute'], params)
+        except Exception:
+            self.record_query(name, 'errors')
+            raise
+
+        elapsed = time.monotonic() - started_at
+        with PostgresDB.query_stats_lock:
+            stats = PostgresDB.query_stats[name]
+            stats['calls'] += 1
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+
+    def record_query(self, name, counter):
+        with PostgresDB.query_stats_lock:
+            PostgresDB.query_stats[name][counter] += 1
+
+    def fetch_prepared(self, name, params = ()):
+        try:
+            self.execute_prepared(name, params)
+            return self.cur.fetchall()
+        except Exception as e:
+            self.logging.debug(f"❌ Error fetching records for {name}: {e}")
+            return None
+
+    def fetch_prepared_frame(self, name, params = ()):
+        try:
+            self.execute_prepared(name, params)
+            columns = [column.name for column in self.cur.description]
+            return pd.DataFrame.from_records(self.cur.fetchall(), columns = columns, coerce_float = True)
+        except Exception as e:
+            self.logging.debug(f"❌ failed to load records for {name}: {e}")
+            return None
+
+    @classmethod
+    def get_query_stats(cls):
+        with cls.query_stats_lock:
+            stats = {name: dict(values) for name, values in cls.query_stats.items()}
+        for values in stats.values():
+            values['avg_seconds'] = values['total_seconds'] / values['calls'] if values['calls'] else 0.0
+        return stats
         
     def commit(self):
         self.conn.commit()
@@ -78,7 +490,143 @@ class PostgresDB:
             
         return True
 
-    
+    def copy_rows(self, table, columns, rows, binary = False, conflict_columns = None, batch_size = 10000,
+                  update_columns = None, returning = None):
+        """Stream tuples or a DataFrame into `table` with COPY FROM STDIN.
+
+        With `conflict_columns` duplicates are skipped, or overwritten when `update_columns` is given.
+        With `returning` as well, the rows actually written come back as a list of those columns.
+        """
+        try:
+            if self.cur is None:
+                self.logging.debug("⚠️ No active database connection.")
+                return False
+
+            target = table
+            if conflict_columns:
+                # COPY cannot skip duplicates, so stage the rows and merge them
+                target = f"{table}_copy_stage"
+                self.cur.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {} AS SELECT {} FROM {} WITH NO DATA").format(
+                    sql.Identifier(target), sql.SQL(', ').join(map(sql.Identifier, columns)), sql.Identifier(table)))
+
+            if binary:
+                types = self.get_column_types(table, columns)
+                chunks = self.binary_copy_chunks(rows, columns, types, batch_size)
+                options = sql.SQL("FORMAT binary")
+            elif isinstance(rows, pd.DataFrame):
+                chunks = self.csv_copy_chunks(rows, columns, batch_size)
+                options = sql.SQL("FORMAT csv, NULL '\\N'")
+            else:
+                chunks = self.text_copy_chunks(rows, batch_size)
+                options = sql.SQL("FORMAT text")
+
+            column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+            query = sql.SQL("COPY {} ({}) FROM STDIN WITH ({})").format(sql.Identifier(target), column_list, options)
+            self.cur.copy_expert(query.as_string(self.conn), CopyStream(chunks))
+
+            if conflict_columns:
+                action = sql.SQL("DO NOTHING")
+                if update_columns:
+                    action = sql.SQL("DO UPDATE SET ") + sql.SQL(', ').join(
+                        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column)) for column in update_columns)
+                query = sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} ON CONFLICT ({}) {}").format(
+                    sql.Identifier(table), column_list, column_list, sql.Identifier(target),
+                    sql.SQL(', ').join(map(sql.Identifier, conflict_columns)), action)
+                if returning:
+                    query += sql.SQL(" RETURNING {}").format(sql.SQL(', ').join(map(sql.Identifier, returning)))
+                self.cur.execute(query)
+                written = self.cur.fetchall() if returning else None
+                self.cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(target)))
+                if returning:
+                    self.logging.debug(f"✅ Copied {len(written)} new rows into {table}.")
+                    return written
+
+            self.logging.debug(f"✅ Copied rows into {table}.")
+        except Exception as e:
+            self.logging.debug(f"❌ Error copying rows into {table}: {e}")
+            return False
+
+        return True
+
+    def text_copy_chunks(self, rows, batch_size):
+        lines = []
+        for row in rows:
+            lines.append('\t'.join(map(copy_text_value, row)))
+            if len(lines) >= batch_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    def csv_copy_chunks(self, df, columns, batch_size):
+        df = df[columns]
+        for i in range(0, len(df), batch_size):
+            yield df.iloc[i:i + batch_size].to_csv(header = False, index = False, na_rep = '\\N')
+
+    def binary_copy_chunks(self, rows, columns, types, batch_size):
+        if isinstance(rows, pd.DataFrame):
+            yield from self.binary_frame_chunks(rows[columns], types, batch_size)
+            return
+
+        encoders = [COPY_BINARY_ENCODERS[item] for item in types]
+        field_count = struct.pack('>h', len(encoders))
+        null_field = struct.pack('>i', -1)
+
+        parts = [PGCOPY_HEADER]
+        for count, row in enumerate(rows, 1):
+            parts.append(field_count)
+            for encode, value in zip(encoders, row):
+                if is_copy_null(value):
+                    parts.append(null_field)
+                else:
+                    data = encode(value)
+                    parts.append(struct.pack('>i', len(data)))
+                    parts.append(data)
+            if count % batch_size == 0:
+                yield b''.join(parts)
+                parts = []
+        parts.append(PGCOPY_TRAILER)
+        yield b''.join(parts)
+
+    def binary_frame_chunks(self, df, types, batch_size):
+        """Binary COPY tuples built column by column, NaN/None/NaT go in as NULL like the CSV path."""
+        yield PGCOPY_HEADER
+        for i in range(0, len(df), batch_size):
+            batch = df.iloc[i:i + batch_size]
+            encoded = [encode_binary_column(batch[column], item) for column, item in zip(batch.columns, types)]
+
+            # Every field is a 4 byte length followed by its payload, NULLs have no payload
+            sizes = np.zeros((len(batch), len(encoded)), dtype = np.int64)
+            for index, (nulls, lengths, _) in enumerate(encoded):
+                sizes[~nulls, index] = lengths
+            field_ends = np.cumsum(sizes + 4, axis = 1)
+            row_sizes = 2 + field_ends[:, -1]
+            row_starts = np.cumsum(row_sizes) - row_sizes
+            buffer = np.empty(int(row_sizes.sum()), dtype = np.uint8)
+
+            field_count = np.full(len(batch), len(encoded), dtype = '>i2')
+            scatter(buffer, row_starts, np.full(len(batch), 2), field_count.tobytes())
+            for index, (nulls, lengths, payload) in enumerate(encoded):
+                field_starts = row_starts + 2 + field_ends[:, index] - sizes[:, index] - 4
+                length_field = np.where(nulls, -1, sizes[:, index]).astype('>i4')
+                scatter(buffer, field_starts, np.full(len(batch), 4), length_field.tobytes())
+                scatter(buffer, field_starts[~nulls] + 4, lengths, payload)
+            yield buffer.tobytes()
+        yield PGCOPY_TRAILER
+
+    def get_column_types(self, table, columns):
+        key = (table, tuple(columns))
+        if key not in PostgresDB.column_types_cache:
+            self.cur.execute("""
+                SELECT a.attname, t.typname FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+            """, (table,))
+            types = dict(self.cur.fetchall())
+            PostgresDB.column_types_cache[key] = [types[column] for column in columns]
+
+        return PostgresDB.column_types_cache[key]
+
     def fetch_records(self, query):
         try:
             # Execute the query
@@ -91,6 +639,30 @@ class PostgresDB:
 
         return None
 
+    def iter_chunks(self, query, params = None, chunk_size = 50000, as_numpy = False):
+        """Yield the result of `query` as DataFrames (or NumPy record arrays) of `chunk_size` rows.
+
+        Rows are fetched through a named server-side cursor, so only one chunk is
+        held in memory. The cursor lives in the current transaction; commit only
+        after the iteration is done.
+        """
+        cursor = self.conn.cursor(name = f"stream_{next(PostgresDB.cursor_ids)}")
+        cursor.itersize = chunk_size
+        try:
+            cursor.execute(query, params)
+            columns = None
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if columns is None:
+                    columns = [column.name for column in cursor.description]
+
+                df = pd.DataFrame.from_records(rows, columns = columns, coerce_float = True)
+                yield df.to_records(index = False) if as_numpy else df
+        finally:
+            cursor.close()
+
     def get_records_in_data_frame(self, query):
         try:
             if self.cur is None:
@@ -104,14 +676,69 @@ class PostgresDB:
             self.logging.debug(f"❌ failed to load records: {e}")
             return None
 
+    def copy_to_frame(self, query, params = None, dtypes = None):
+        """Read `query` with COPY TO STDOUT and parse it with explicit dtypes.
+
+        Numeric/decimal columns come back as float64 and timestamps as
+        datetime64, without building a Python tuple per row. `dtypes` overrides
+        the types derived from the result columns.
+        """
+        try:
+            if self.cur is None:
+                self.logging.debug("❌ No active database connection.")
+                return None
+
+            statement = self.cur.mogrify(query, params).decode() if params else query
+            column_dtypes = dict(self.get_copy_read_dtypes(query, statement))
+            column_dtypes.update(dtypes or {})
+
+            buffer = io.BytesIO()
+            # NULL gets its own marker so empty strings in text columns stay ''
+            self.cur.copy_expert(f"COPY ({statement}) TO STDOUT WITH (FORMAT csv, HEADER, NULL '\\N')", buffer)
+            buffer.seek(0)
+
+            dates = [name for name, dtype in column_dtypes.items() if dtype.startswith('datetime64')]
+            parse_dtypes = {name: dtype for name, dtype in column_dtypes.items() if name not in dates and dtype != 'bool'}
+            df = pd.read_csv(buffer, dtype = parse_dtypes, true_values = ['t'], false_values = ['f'], keep_default_na = False, na_values = ['\\N'])
+
+            for name in dates:
+                df[name] = pd.to_datetime(df[name], format = 'ISO8601').astype(column_dtypes[name])
+            return df
+
+        except ValueError as e:
+            # e.g. NULLs in an integer column, fall back to the generic reader
+            self.logging.debug(f"❌ failed to parse copied records, falling back: {e}")
+            return self.get_records_in_data_frame(statement)
+        except Exception as e:
+            self.logging.debug(f"❌ failed to copy records: {e}")
+            return None
+
+    def get_copy_read_dtypes(self, query, statement):
+        # Keyed by the query template, the result columns do not depend on the parameters
+        if query not in PostgresDB.copy_read_dtypes_cache:
+            self.cur.execute(f"SELECT * FROM ({statement}) copy_read LIMIT 0")
+            PostgresDB.copy_read_dtypes_cache[query] = [
+                (column.name, COPY_READ_DTYPES.get(column.type_code, 'object'))
+                for column in self.cur.description
+            ]
+        return PostgresDB.copy_read_dtypes_cache[query]
+
     def close(self):
-        """Close the database connection."""
+        """Return the connection to the pool."""
         if self.cur is not None:
-            self.cur.close()
-        if self.conn is not None:
-            self.conn.close()
+            try:
+                self.cur.close()
+            except Exception:
+                pass
+        self.release()
         self.logging.debug("🔌 Database connection closed.")
 
+    def release(self):
+        if self.conn is not None:
+            self.pool.putconn(self.conn)
+        self.conn = None
+        self.cur = None
+
     def create_database(self, db_name):
         """Creates the 'sharemarkets' database if it doesn't exist."""
         try:
@@ -0,0 +1,133 @@
+import time
+import traceback
+from psycopg2 import sql
+
+from db_connect import PostgresDB
+
+class DbJobRunner:
+    """Runs copy/transform jobs as INSERT ... SELECT inside Postgres.
+
+    Rows never leave the server. Large sources are processed in ranges of
+    about `batch_size` rows, committing after each range, so a long job keeps making
+    durable progress and never holds one huge transaction.
+    """
+
+    def __init__(self, setting, logging):
+        self.setting = setting
+        self.logging = logging
+        self.db_conn = PostgresDB(setting, logging)
+        self.stats = {}
+
+    def source_filter(self, from_dt, to_dt, date_column):
+        conditions = []
+        params = []
+        if from_dt is not None:
+            conditions.append(sql.SQL("{} >= %s").format(sql.Identifier(date_column)))
+            params.append(from_dt)
+        if to_dt is not None:
+            conditions.append(sql.SQL("{} <= %s").format(sql.Identifier(date_column)))
+            params.append(to_dt)
+        return conditions, params
+
+    def insert_select(self, target, columns, source, from_dt = None, to_dt = None, date_column = 'date',
+                      id_column = 'id', batch_size = 500000, conflict_columns = None, order_by = None):
+        """Copy `columns` from `source` into `target`, optionally limited to a date range.
+
+        Batches are id ranges, or ranges of `order_by` when given so that the
+        target's ids follow that order across the whole copy.
+        Returns the number of rows inserted, or None on failure.
+        """
+        started_at = time.monotonic()
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+        conditions, params = self.source_filter(from_dt, to_dt, date_column)
+
+        try:
+            self.db_conn.connect()
+
+            where = sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions) if conditions else sql.SQL('')
+            batch_column = order_by or id_column
+            self.db_conn.cur.execute(sql.SQL("SELECT min({column}), max({column}) FROM {source}{where}").format(
+                column = sql.Identifier(batch_column), source = sql.Identifier(source), where = where), params)
+            low, high = self.db_conn.cur.fetchone()
+            if low is None:
+                self.logging.info(f"No rows to copy from {source} into {target}")
+                return 0
+
+            conflict = sql.SQL('')
+            if conflict_columns:
+                conflict = sql.SQL(" ON CONFLICT ({}) DO NOTHING").format(
+                    sql.SQL(', ').join(map(sql.Identifier, conflict_columns)))
+            order = sql.SQL(" ORDER BY {}").format(sql.Identifier(order_by)) if order_by else sql.SQL('')
+
+            # Value ranges include their upper bound so rows sharing it stay in one batch
+            upper = sql.SQL('<=') if order_by else sql.SQL('<')
+            range_conditions = conditions + [sql.SQL("{0} >= %s AND {0} {1} %s").format(sql.Identifier(batch_column), upper)]
+            query = sql.SQL("INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE {where}{order}{conflict}").format(
+                target = sql.Identifier(target), columns = column_list, source = sql.Identifier(source),
+                where = sql.SQL(' AND ').join(range_conditions), order = order, conflict = conflict)
+
+            inserted = 0
+            batches = 0
+            if order_by:
+                ranges = self.value_ranges(source, order_by, conditions, params, low, high, batch_size)
+            else:
+                ranges = ((start, start + batch_size) for start in range(low, high + 1, batch_size))
+
+            for start, end in ranges:
+                self.db_conn.cur.execute(query, params + [start, end])
+                inserted += self.db_conn.cur.rowcount
+                batches += 1
+                self.db_conn.commit()
+
+            elapsed = time.monotonic() - started_at
+            self.stats[f"{source}->{target}"] = {'rows': inserted, 'batches': batches, 'seconds': round(elapsed, 3)}
+            self.logging.info(f"Copied {inserted} rows from {source} into {target} in {batches} batches ({elapsed:.2f}s)")
+            return inserted
+        except Exception as e:
+            self.logging.error(f"Error copying {source} into {target}: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+
+        return None
+
+    def value_ranges(self, source, column, conditions, params, low, high, batch_size):
+        """Inclusive (start, end) ranges of `column` holding about `batch_size` rows each."""
+        column_id = sql.Identifier(column)
+        last_query = sql.SQL("SELECT {column} FROM {source} WHERE {where} ORDER BY {column} OFFSET %s LIMIT 1").format(
+            column = column_id, source = sql.Identifier(source),
+            where = sql.SQL(' AND ').join(conditions + [sql.SQL("{} >= %s").format(column_id)]))
+        next_query = sql.SQL("SELECT min({column}) FROM {source} WHERE {where}").format(
+            column = column_id, source = sql.Identifier(source),
+            where = sql.SQL(' AND ').join(conditions + [sql.SQL("{} > %s").format(column_id)]))
+
+        start = low
+        while start is not None:
+            self.db_conn.cur.execute(last_query, params + [start, batch_size - 1])
+            row = self.db_conn.cur.fetchone()
+            end = row[0] if row else high
+            yield start, end
+            self.db_conn.cur.execute(next_query, params + [end])
+            start = self.db_conn.cur.fetchone()[0]
+
+    def export_csv(self, query, path, params = None):
+        """Write the result of `query` to a CSV file with COPY ... TO STDOUT."""
+        started_at = time.monotonic()
+        try:
+            self.db_conn.connect()
+            statement = self.db_conn.cur.mogrify(query, params) if params else query
+            if isinstance(statement, bytes):
+                statement = statement.decode()
+
+            with open(path, 'w', newline = '') as file:
+                self.db_conn.cur.copy_expert(f"COPY ({statement}) TO STDOUT WITH (FORMAT csv, HEADER)", file)
+
+            self.logging.info(f"Exported {path} in {time.monotonic() - started_at:.2f}s")
+            return True
+        except Exception as e:
+            self.logging.error(f"Error exporting {path}: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+
+        return False
@@ -4,6 +4,8 @@ import sys
 
 from settings import Setting
 from db_connect import PostgresDB
+from tick_partitions import TickPartitionManager
+from oi_aggregates import OiAggregateStore
 
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG,
 	format="%(asctime)s[%(levelname)s] - %(message)s")
@@ -102,7 +104,7 @@ processed_details = """
 
 tick_details = """
     CREATE TABLE IF NOT EXISTS tick_details (
-        id SERIAL PRIMARY KEY,
+        id SERIAL,
         token BIGINT NOT NULL,
         unique_key BIGINT NOT NULL,
         date TIMESTAMP NOT NULL,
@@ -112,17 +114,22 @@ tick_details = """
         bid_volume BIGINT NOT NULL,
         offer_volume BIGINT NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, date),
         UNIQUE (token, date)
-    );
+    ) PARTITION BY RANGE (date);
+
+    -- One partition per trading day is created by TickPartitionManager,
+    -- the default partition only catches ticks for a day that has none yet
+    CREATE TABLE IF NOT EXISTS tick_details_default PARTITION OF tick_details DEFAULT;
     
     -- Add an index on (token, date) for faster date-based queries
-    CREATE INDEX tick_details_token_date 
+    CREATE INDEX IF NOT EXISTS tick_details_token_date 
     ON tick_details (token, date);
 """
 
 tick_details_copy = """
     CREATE TABLE IF NOT EXISTS tick_details_copy (
-        id SERIAL PRIMARY KEY,
+        id SERIAL,
         token BIGINT NOT NULL,
         unique_key BIGINT NOT NULL,
         date TIMESTAMP NOT NULL,
@@ -132,14 +139,44 @@ tick_details_copy = """
         bid_volume BIGINT NOT NULL,
         offer_volume BIGINT NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, date),
         UNIQUE (token, date)
-    );
+    ) PARTITION BY RANGE (date);
+
+    -- One partition per trading day is created by TickPartitionManager,
+    -- the default partition only catches ticks for a day that has none yet
+    CREATE TABLE IF NOT EXISTS tick_details_copy_default PARTITION OF tick_details_copy DEFAULT;
     
     -- Add an index on (token, date) for faster date-based queries
-    CREATE INDEX tick_details_copy_token_date 
+    CREATE INDEX IF NOT EXISTS tick_details_copy_token_date 
     ON tick_details_copy (token, date);
 """
 
+tick_oi_5m = """
+    CREATE TABLE IF NOT EXISTS tick_oi_5m (
+        token BIGINT NOT NULL,
+        unique_key BIGINT NOT NULL,
+        date TIMESTAMP NOT NULL,
+        first_at TIMESTAMP NOT NULL,
+        last_at TIMESTAMP NOT NULL,
+        first_oi BIGINT NOT NULL,
+        last_oi BIGINT NOT NULL,
+        min_oi BIGINT NOT NULL,
+        max_oi BIGINT NOT NULL,
+        first_price DECIMAL(10, 4) NOT NULL,
+        last_price DECIMAL(10, 4) NOT NULL,
+        min_price DECIMAL(10, 4) NOT NULL,
+        max_price DECIMAL(10, 4) NOT NULL,
+        volume_traded BIGINT NOT NULL,
+        tick_count INTEGER NOT NULL,
+        PRIMARY KEY (token, unique_key)
+    );
+
+    -- Day-wide scans across every token filter on unique_key alone
+    CREATE INDEX IF NOT EXISTS tick_oi_5m_unique_key
+    ON tick_oi_5m (unique_key);
+"""
+
 traning_data = """
     CREATE TABLE IF NOT EXISTS traning_data (
     id SERIAL PRIMARY KEY,
@@ -174,9 +211,19 @@ print(s)
     
 # db.create_database("sharemarkets")
 db.create_tables(tick_details_copy)
+db.create_tables(tick_oi_5m)
 
 db.close()
 
+# Move plain tick tables onto daily partitions and create today's/tomorrow's
+partitions = TickPartitionManager(setting, logging)
+partitions.migrate_to_partitioned('tick_details', tick_details)
+partitions.migrate_to_partitioned('tick_details_copy', tick_details_copy)
+partitions.maintain()
+
+# Backfill the 5-minute OI bars from the ticks already stored
+OiAggregateStore(setting, logging).rebuild()
+
 # select unique_key, date, ce_token, ce_beta, ce_oi, ce_quantity, created_at from processed_details order by created_at;
 # select unique_key,date,pe_token,pe_beta,pe_oi,pe_quantity,created_at from processed_details order by created_at;
 #select min(date) as date1, oi from tick_details where token=13158146 group by token, oi order by date1;
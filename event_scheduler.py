@@ -0,0 +1,79 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+class EventScheduler:
+    """Condition-variable loop driver for live trading.
+
+    Callbacks from the KiteTicker thread call `notify`; the main loop blocks
+    in `wait` and gets back the set of events that are due, so it only runs
+    the stages whose inputs changed.
+    """
+
+    TICK = 'tick'
+    BAR_CLOSE = 'bar_close'
+    ORDER_UPDATE = 'order_update'
+    HEARTBEAT = 'heartbeat'
+
+    def __init__(self, logging, bar_minutes = 5, bar_close_delay = 1.0, heartbeat = 15.0, min_tick_interval = 4.0):
+        self.logging = logging
+        self.bar_seconds = bar_minutes * 60
+        self.bar_close_delay = bar_close_delay
+        self.heartbeat = heartbeat
+        self.min_tick_interval = min_tick_interval
+        self.condition = threading.Condition()
+        self.pending = set()
+        self.bar_due = self.next_bar_close(datetime.now())
+        # Fire a heartbeat straight away so the first pass does the full setup
+        self.heartbeat_due = time.monotonic()
+        self.last_tick_run = 0.0
+        self.stats = {self.TICK: 0, self.BAR_CLOSE: 0, self.ORDER_UPDATE: 0, self.HEARTBEAT: 0, 'bar_close_lag': 0.0}
+
+    def next_bar_close(self, now):
+        # Bars are anchored at 09:15; wake a little after the boundary so the last ticks are in
+        anchor = datetime(now.year, now.month, now.day, 9, 15)
+        offset = (now - anchor).total_seconds() - self.bar_close_delay
+        count = math.floor(offset / self.bar_seconds) + 1
+        return anchor + timedelta(seconds = count * self.bar_seconds + self.bar_close_delay)
+
+    def notify(self, event):
+        with self.condition:
+            self.pending.add(event)
+            self.condition.notify()
+
+    def wait(self):
+        with self.condition:
+            while True:
+                now = datetime.now()
+                monotonic = time.monotonic()
+                fired = set()
+
+                if now >= self.bar_due:
+                    fired.add(self.BAR_CLOSE)
+                    self.stats['bar_close_lag'] = (now - self.bar_due).total_seconds()
+                    self.bar_due = self.next_bar_close(now)
+
+                if monotonic >= self.heartbeat_due:
+                    fired.add(self.HEARTBEAT)
+                    self.heartbeat_due = monotonic + self.heartbeat
+
+                if self.ORDER_UPDATE in self.pending:
+                    fired.add(self.ORDER_UPDATE)
+
+                # Ticks arrive many times a second, so coalesce them
+                tick_due = self.last_tick_run + self.min_tick_interval
+                if self.TICK in self.pending and monotonic >= tick_due:
+                    fired.add(self.TICK)
+                    self.last_tick_run = monotonic
+
+                if fired:
+                    self.pending -= fired
+                    for event in fired:
+                        self.stats[event] += 1
+                    return fired
+
+                timeout = min((self.bar_due - now).total_seconds(), self.heartbeat_due - monotonic)
+                if self.TICK in self.pending:
+                    timeout = min(timeout, tick_due - monotonic)
+                self.condition.wait(max(timeout, 0.01))
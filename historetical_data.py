@@ -4,6 +4,7 @@ import time
 import traceback
 
 from db_connect import PostgresDB
+from candle_archive import CandleArchive
 from common import Util
 
 class HistoricalData:
@@ -12,13 +13,36 @@ class HistoricalData:
         self.token = token
         self.setting = setting
         self.db_conn = PostgresDB(setting, logging)
+        self.archive = CandleArchive(setting, logging)
         self.required_5m_data_count = 210
         self.required_30m_data_count = 15
         self.data_5min = None
         self.data_30min = None
         self.logging = logging
+        self.register_queries()
+
+    def register_queries(self):
+        # Table names come from settings, so they are fixed per registration
+        for table_name in [self.setting.table_name_5m, self.setting.table_name_30m]:
+            PostgresDB.register_query(f'is_data_synced_{table_name}', f"""
+                SELECT COUNT(*) FROM {table_name} WHERE token = $1 AND created_at >= $2
+            """, ['bigint', 'timestamp'])
+
+            PostgresDB.register_query(f'last_unique_key_{table_name}', f"""
+                SELECT max(unique_key) FROM {table_name} WHERE token = $1
+            """, ['bigint'])
+
+            PostgresDB.register_query(f'last_unique_key_before_{table_name}', f"""
+                SELECT max(unique_key) FROM {table_name} WHERE token = $1 AND unique_key < $2
+            """, ['bigint', 'bigint'])
+
+    def prepare(self, force = False, incremental = False):
+        if incremental:
+            # Keep the candles already synced, only expire what is past retention
+            before = datetime.now() - timedelta(days = self.setting.historical_retention_days)
+            return (self.trim_pre_records(self.setting.table_name_5m, before)
+                    and self.trim_pre_records(self.setting.table_name_30m, before))
 
-    def prepare(self, force = False):
         if force or not self.any_five_min_data_synced():
             if not self.clean_pre_records(self.setting.table_name_5m):
                 return False
@@ -62,9 +86,9 @@ class HistoricalData:
         synced = False
         try:
             self.db_conn.connect()
-            today = datetime.now().strftime('%Y-%m-%d')
-            query = f"SELECT COUNT(*) FROM {table_name} WHERE token = {self.token} and created_at >= '{today} 00:00:00'"
-            result = self.db_conn.fetch_records(query)
+            now = datetime.now()
+            today = datetime(now.year, now.month, now.day)
+            result = self.db_conn.fetch_prepared(f'is_data_synced_{table_name}', (self.token, today))
             synced = result[0][0] > 0
         except Exception as e:
             self.logging.error(f"Error fetching 30m data for {self.token}: {e}")
@@ -72,6 +96,21 @@ class HistoricalData:
             self.db_conn.close()
         return synced
 
+    def last_unique_key(self, table_name, before_unique_key = None):
+        """Latest candle key stored for this token, None when there is none (or on error)."""
+        try:
+            self.db_conn.connect()
+            if before_unique_key is not None:
+                result = self.db_conn.fetch_prepared(f'last_unique_key_before_{table_name}', (self.token, before_unique_key))
+            else:
+                result = self.db_conn.fetch_prepared(f'last_unique_key_{table_name}', (self.token,))
+            return result[0][0]
+        except Exception as e:
+            self.logging.error(f"Error fetching last synced candle for {self.token} in {table_name}: {e}")
+        finally:
+            self.db_conn.close()
+        return None
+
     def sync_five_min_data(self, kite_login):
         collected    = False
         current_time = datetime.now()
@@ -111,17 +150,7 @@ class HistoricalData:
             time.sleep(5)
     
         self.logging.info(f"Ended fetching {len(full_data)} data points for {self.token} at {datetime.now()}")
-
-        full_data = full_data.drop(columns = ["volume"])
-        full_data['date'] = full_data.apply(lambda row: Util.parse_datetime(row["date"]), axis=1)
-        full_data         = full_data.sort_values(by = 'date', ascending = True)
-
-        full_data["unique_key"] = full_data.apply(lambda row: Util.generate_5m_id(row["date"]), axis=1)
-        full_data["token"]      = full_data.apply(lambda row: self.token, axis=1)
-        
-        #full_data.to_csv('NIFTY50.csv')
-        
-        return self.save_data_to_db(full_data, self.setting.table_name_5m)
+        return self.save_candles(full_data, self.setting.table_name_5m, Util.generate_5m_ids)
 
     def sync_five_min_data_for_day(self, kite_login, current_time):
         collected    = False
@@ -158,11 +187,11 @@ class HistoricalData:
         self.logging.info(f"Ended fetching {len(full_data)} data points for {self.token} at {datetime.now()}")
 
         full_data = full_data.drop(columns = ["volume"])
-        full_data['date'] = full_data.apply(lambda row: Util.parse_datetime(row["date"]), axis=1)
+        full_data['date'] = Util.parse_datetimes(full_data['date'])
         full_data         = full_data.sort_values(by = 'date', ascending = True)
 
-        full_data["unique_key"] = full_data.apply(lambda row: Util.generate_5m_id(row["date"]), axis=1)
-        full_data["token"]      = full_data.apply(lambda row: self.token, axis=1)
+        full_data["unique_key"] = Util.generate_5m_ids(full_data["date"])
+        full_data["token"]      = self.token
         
         #full_data.to_csv('NIFTY50.csv')
         
@@ -209,29 +238,49 @@ class HistoricalData:
         self.logging.info(f"Ended fetching {len(full_data)} data points for {self.token} at {datetime.now()}")
 
         full_data = full_data.drop(columns = ["volume"])
-        full_data['date'] = full_data.apply(lambda row: Util.parse_datetime(row["date"]), axis=1)
+        full_data['date'] = Util.parse_datetimes(full_data['date'])
         full_data         = full_data.sort_values(by = 'date', ascending = True)
 
-        full_data["unique_key"] = full_data.apply(lambda row: Util.generate_5m_id(row["date"]), axis=1)
-        full_data["token"]      = full_data.apply(lambda row: self.token, axis=1)
+        full_data["unique_key"] = Util.generate_5m_ids(full_data["date"])
+        full_data["token"]      = self.token
         
         #full_data.to_csv('NIFTY50.csv')
         
         return self.save_data_to_db(full_data, self.setting.table_name_5m)
 
+    def save_candles(self, data, table_name, generate_ids):
+        """Store kite historical candles (a list or a frame) in `table_name`, keyed by `generate_ids`."""
+        full_data = pd.DataFrame(data)
+        if full_data.empty:
+            return False
+
+        full_data = full_data.drop(columns = ["volume"], errors = "ignore")
+        full_data['date'] = Util.parse_datetimes(full_data['date'])
+        # Windows fetched concurrently can arrive in any order
+        full_data         = full_data.drop_duplicates(subset = 'date').sort_values(by = 'date', ascending = True)
+
+        full_data["unique_key"] = generate_ids(full_data["date"])
+        full_data["token"]      = self.token
+
+        if not self.save_data_to_db(full_data, table_name):
+            return False
+
+        self.archive.write(table_name, self.token, full_data)
+        return True
+
     def save_data_to_db(self, df, table_name):
         saved      = False
         batch_size = 500
         
         try:
-            query = "INSERT INTO %s(date, open, high, low, close, unique_key, token) VALUES %%s" % (table_name)
+            columns = ['date', 'open', 'high', 'low', 'close', 'unique_key', 'token']
             self.db_conn.connect()
             
-            for i in range(0, len(df), batch_size):
-                batch = df.iloc[i:i + batch_size]
-                tuples = [tuple(x) for x in batch.to_numpy()] 
-                
-                self.db_conn.insert_bulk_data(query, tuples)
+            # Upsert, incremental syncs can refetch candles that are already stored
+            if not self.db_conn.copy_rows(table_name, columns, df, batch_size = batch_size,
+                                          conflict_columns = ['token', 'unique_key'],
+                                          update_columns = ['date', 'open', 'high', 'low', 'close']):
+                raise Exception("COPY into table failed")
                 
             self.db_conn.commit()
             saved = True
@@ -284,25 +333,43 @@ class HistoricalData:
             time.sleep(5)
     
         self.logging.info(f"Ended fetching {len(full_data)} data points for {self.token} 30min data at {datetime.now()}")
+        return self.save_candles(full_data, self.setting.table_name_30m, Util.generate_30m_ids)
 
-        full_data         = full_data.drop(columns = ["volume"])
-        full_data['date'] = full_data.apply(lambda row: Util.parse_datetime(row["date"]), axis=1)
-        full_data         = full_data.sort_values(by = 'date', ascending = True)
+    def load_archived(self, table_name, required, before_unique_key = None):
+        """Candles from the local archive, None when it is missing, short or behind the table."""
+        if not self.archive.enabled:
+            return None
 
-        full_data["unique_key"] = full_data.apply(lambda row: Util.generate_30m_id(row["date"]), axis=1)
-        full_data["token"]      = full_data.apply(lambda row: self.token, axis=1)
-        
-        return self.save_data_to_db(full_data, self.setting.table_name_30m)
+        to_dt = datetime.now()
+        if before_unique_key is not None:
+            to_dt = datetime.strptime(str(before_unique_key // 10000), '%Y%m%d') + timedelta(days = 1)
+        # Same window the table keeps, see prepare(incremental = True)
+        from_dt = to_dt - timedelta(days = self.setting.historical_retention_days + 1)
+
+        data = self.archive.read(table_name, self.token, from_dt, to_dt, before_unique_key)
+        if data is None or len(data) < required:
+            return None
+
+        last_unique_key = self.last_unique_key(table_name, before_unique_key)
+        if last_unique_key is not None and data['unique_key'].iloc[-1] < last_unique_key:
+            self.logging.info(f"Archived {table_name} candles for {self.token} are behind the table, reading the table")
+            return None
+        return data
 
     def load_5min_data(self, unique_key):
         try:
+            if self.data_5min is None:
+                self.data_5min = self.load_archived(self.setting.table_name_5m, self.required_5m_data_count, unique_key)
+
             if self.data_5min is None:
                 self.db_conn.connect()
+                # Months of candles, so read them through COPY rather than row by row
                 query = """SELECT date, open, high, low, close, unique_key, token FROM %s
-                where token = %s and unique_key < %s
-                """ % (self.setting.table_name_5m, self.token, unique_key) 
-                
-                self.data_5min = self.db_conn.get_records_in_data_frame(query)
+                where token = %%s and unique_key < %%s
+                ORDER BY unique_key
+                """ % self.setting.table_name_5m
+                self.data_5min = self.db_conn.copy_to_frame(query, (self.token, unique_key))
+                self.archive.write(self.setting.table_name_5m, self.token, self.data_5min)
         except Exception as e:
             self.logging.error(f"Error in loading 5min data for {self.token}: {e}")
         finally:
@@ -319,6 +386,7 @@ class HistoricalData:
             self.db_conn.connect()
             query = """SELECT date, open, high, low, close, token FROM %s
             where token = %s and unique_key >= %s and unique_key < %s
+            ORDER BY unique_key
             """ % (self.setting.table_name_5m, self.token, from_unique_key, to_unique_key)
             
             return self.db_conn.get_records_in_data_frame(query)
@@ -333,11 +401,15 @@ class HistoricalData:
         
     def load_30min_data(self):
         try:
+            if self.data_30min is None:
+                self.data_30min = self.load_archived(self.setting.table_name_30m, self.required_30m_data_count)
+
             if self.data_30min is None:
                 self.db_conn.connect()
-                query = "SELECT date, open, high, low, close, unique_key, token FROM %s where token = %s" % (self.setting.table_name_30m, self.token) 
+                query = "SELECT date, open, high, low, close, unique_key, token FROM %s where token = %s ORDER BY unique_key" % (self.setting.table_name_30m, self.token) 
                 
                 self.data_30min = self.db_conn.get_records_in_data_frame(query)
+                self.archive.write(self.setting.table_name_30m, self.token, self.data_30min)
         except Exception as e:
             self.logging.error(f"Error in loading 30min data for {self.token}: {e}")
         finally:
@@ -346,14 +418,27 @@ class HistoricalData:
 
         return self.data_30min
         
+    def trim_pre_records(self, table_name, before):
+        executed = False
+        try:
+            self.db_conn.connect()
+            self.db_conn.cur.execute(f"DELETE FROM {table_name} WHERE date < %s", (before,))
+            self.logging.info(f"Removed {self.db_conn.cur.rowcount} candles older than {before:%Y-%m-%d} from {table_name}")
+            self.db_conn.commit()
+            executed = True
+        except Exception as e:
+            self.logging.error(f"Error trimming records in {table_name}: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+        return executed
+
     def clean_pre_records(self, table_name):
         executed = False
         try:
             self.db_conn.connect()
             query = f"TRUNCATE {table_name} RESTART IDENTITY"
             self.db_conn.execute_query(query)
-            query2 = f"TRUNCATE tick_details RESTART IDENTITY"
-            self.db_conn.execute_query(query2)
             self.db_conn.commit()
             executed = True
         except Exception as e:
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+class HistoricalCache:
+    """Process-wide LRU cache in front of `kite.historical_data`.
+
+    Entries are keyed by (token, interval, from, to). A window whose last bar
+    is still forming expires when that bar closes. Right after the close Kite
+    may still be publishing the final bar, so such a window is only kept for
+    a few seconds at a time until the bar has settled; after that it never
+    changes and only leaves through LRU eviction. Concurrent misses on
+    the same key wait for the first caller's request instead of sending
+    their own. Returned lists are shared between callers, treat them as
+    read-only.
+    """
+
+    interval_minutes = {'minute': 1, '3minute': 3, '5minute': 5, '10minute': 10, '15minute': 15,
+                        '30minute': 30, '60minute': 60, 'day': 1440}
+
+    instance = None
+    instance_lock = threading.Lock()
+
+    def __init__(self, logging, max_entries = 512, close_delay = 5.0, settle_time = 60.0, settle_ttl = 10.0):
+        self.logging = logging
+        self.max_entries = max_entries
+        # Kite needs a moment after the close to publish the final bar
+        self.close_delay = timedelta(seconds = close_delay)
+        # and may still revise it for a while, so until then a closed window is only cached briefly
+        self.settle_time = timedelta(seconds = settle_time)
+        self.settle_ttl = timedelta(seconds = settle_ttl)
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'expired': 0, 'evicted': 0, 'errors': 0}
+
+    @classmethod
+    def shared(cls, logging, max_entries = 512):
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls(logging, max_entries)
+            return cls.instance
+
+    def bar_close(self, time, interval):
+        minutes = self.interval_minutes.get(interval, 1)
+        if minutes >= 1440:
+            return datetime(time.year, time.month, time.day) + timedelta(days = 1)
+        anchor = datetime(time.year, time.month, time.day, 9, 15)
+        offset = int((time - anchor).total_seconds() // 60)
+        return anchor + timedelta(minutes = (offset // minutes + 1) * minutes)
+
+    def expires_at(self, to_dt, interval, now):
+        """When a window ending at `to_dt` goes stale, None once its last bar has settled."""
+        close = self.bar_close(to_dt, interval)
+        if now < close + self.close_delay:
+            return close + self.close_delay
+        if now < close + self.settle_time:
+            return min(now + self.settle_ttl, close + self.settle_time)
+        return None
+
+    def fetch(self, kite_login, token, from_dt, to_dt, interval = '5minute'):
+        key = (int(token), interval, from_dt, to_dt)
+        now = datetime.now()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at is None or now < expires_at:
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return data
+                del self.entries[key]
+                self.stats['expired'] += 1
+
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.in_flight[key] = future
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            data = kite_login.conn.historical_data(token, from_dt, to_dt, interval)
+        except Exception as e:
+            with self.lock:
+                self.in_flight.pop(key, None)
+                self.stats['errors'] += 1
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.entries[key] = (self.expires_at(to_dt, interval, datetime.now()), data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+                self.stats['evicted'] += 1
+            self.in_flight.pop(key, None)
+
+        future.set_result(data)
+        return data
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else 0.0
+        return stats
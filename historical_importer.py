@@ -0,0 +1,246 @@
+import math
+import random
+import time
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from kiteconnect import exceptions
+
+from common import Util
+from historetical_data import HistoricalData
+from rate_limiter import TokenBucket
+from candle_resampler import CandleResampler
+
+class HistoricalImporter:
+    """Syncs 5m/30m history for many tokens concurrently under Kite's rate limit.
+
+    Every token and interval is split into the same backwards date windows
+    HistoricalData pages through, the windows are fetched in parallel and each
+    request first takes a permit from a shared token bucket, so startup time
+    is bounded by the historical API limit rather than by fixed sleeps. With
+    historical_derive_30m the 30m history is resampled from the 5m candles
+    and costs no requests at all.
+    """
+
+    # Errors that a retry cannot fix
+    permanent_errors = (exceptions.InputException, exceptions.TokenException, exceptions.PermissionException)
+
+    def __init__(self, setting, logging, kite_login):
+        self.setting = setting
+        self.logging = logging
+        self.kite_login = kite_login
+        # No burst: Kite counts requests per wall-clock second
+        self.limiter = TokenBucket(setting.historical_rate_limit, capacity = 1)
+        self.resampler = CandleResampler(setting, logging)
+        self.retries = setting.historical_retries
+        self.max_pages = setting.historical_max_pages
+        self.max_workers = setting.historical_workers
+        self.intervals = {
+            '5minute': {
+                'table_name': setting.table_name_5m,
+                'generate_ids': Util.generate_5m_ids,
+                'required': 210,
+                'page_days': 3,
+                'candles_per_day': 75,
+                'max_days': 100
+            },
+            '30minute': {
+                'table_name': setting.table_name_30m,
+                'generate_ids': Util.generate_30m_ids,
+                'required': 15,
+                'page_days': 2,
+                'candles_per_day': 13,
+                'max_days': 200
+            }
+        }
+        self.stats = {'requests': 0, 'retries': 0, 'failed_requests': 0}
+
+    def window(self, interval, page, current_time):
+        """Date window of backwards `page` (0 is the most recent), as HistoricalData pages them."""
+        page_days = self.intervals[interval]['page_days']
+        start_day = current_time - timedelta(days = page_days * (page + 1))
+        end_day   = current_time - timedelta(days = page_days * page + 1)
+        return (datetime(start_day.year, start_day.month, start_day.day, 9, 0),
+                datetime(end_day.year, end_day.month, end_day.day, 16, 0))
+
+    def missing_windows(self, interval, last_unique_key, current_time):
+        """Windows covering the trading days after `last_unique_key` up to yesterday, split at Kite's span limit."""
+        oldest = (current_time - timedelta(days = self.setting.historical_retention_days)).date()
+        last_day = datetime.strptime(str(last_unique_key // 10000), '%Y%m%d').date()
+        days = Util.trading_days(max(last_day + timedelta(days = 1), oldest),
+                                 (current_time - timedelta(days = 1)).date(), self.setting.market_holidays)
+
+        windows = []
+        max_days = self.intervals[interval]['max_days']
+        while days:
+            first = days[0]
+            span = [day for day in days if (day - first).days < max_days]
+            days = days[len(span):]
+            windows.append((datetime(first.year, first.month, first.day, 9, 0),
+                            datetime(span[-1].year, span[-1].month, span[-1].day, 16, 0)))
+        return windows
+
+    def initial_pages(self, interval):
+        # Enough calendar days to cover the required candles across a weekend
+        config = self.intervals[interval]
+        trading_days = math.ceil(config['required'] / config['candles_per_day'])
+        return min(math.ceil((trading_days * 7 / 5 + 1) / config['page_days']), self.max_pages)
+
+    def fetch(self, token, interval, from_dt, to_dt):
+        """One historical_data call behind the rate limiter, retried with jittered backoff."""
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            self.stats['requests'] += 1
+            try:
+                return self.kite_login.conn.historical_data(token, from_dt, to_dt, interval)
+            except self.permanent_errors:
+                raise
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                self.stats['retries'] += 1
+                delay = random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+                self.logging.warning(f"Retrying {interval} history for {token} in {delay:.2f}s ({attempt + 1}/{self.retries}): {e}")
+                time.sleep(delay)
+
+    def run(self, tokens, intervals = None, current_time = None, incremental = None):
+        """Sync every (token, interval) not yet synced today; returns {(token, interval): bool}.
+
+        Incremental runs fetch only the trading days after each token's latest
+        stored candle; tokens with no candles yet fall back to paging backwards.
+        """
+        started_at = time.monotonic()
+        current_time = current_time or datetime.now()
+        intervals = intervals or list(self.intervals)
+        if incremental is None:
+            incremental = self.setting.historical_incremental
+
+        # 30m bars are resampled from the 5m ones instead of spending API calls on them
+        derived = []
+        if self.setting.historical_derive_30m and '30minute' in intervals:
+            derived = ['30minute']
+            intervals = [interval for interval in intervals if interval not in derived]
+
+        jobs = {}
+        results = {}
+        for token in tokens:
+            h_data = HistoricalData(self.setting, token, self.logging)
+            for interval in intervals:
+                table_name = self.intervals[interval]['table_name']
+                windows = None
+                if incremental:
+                    last_unique_key = h_data.last_unique_key(table_name)
+                    if last_unique_key is not None:
+                        windows = self.missing_windows(interval, last_unique_key, current_time)
+                        if not windows:
+                            results[(token, interval)] = True
+                            continue
+                elif h_data.is_data_synced(table_name):
+                    results[(token, interval)] = True
+                    continue
+                jobs[(token, interval)] = {'h_data': h_data, 'candles': [], 'pages': 0, 'pending': 0, 'windows': windows,
+                                           'failed': False, 'started_at': time.monotonic()}
+
+        self.logging.info(f"Syncing {len(jobs)} histories, {len(results)} already synced today")
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers = self.max_workers, thread_name_prefix = 'history') as executor:
+            futures = {}
+
+            def submit(key, pages):
+                token, interval = key
+                job = jobs[key]
+                for page in range(job['pages'], min(job['pages'] + pages, self.max_pages)):
+                    from_dt, to_dt = self.window(interval, page, current_time)
+                    futures[executor.submit(self.fetch, token, interval, from_dt, to_dt)] = key
+                    job['pending'] += 1
+                    job['pages'] = page + 1
+
+            for key, job in jobs.items():
+                if job['windows'] is None:
+                    submit(key, self.initial_pages(key[1]))
+                    continue
+                for from_dt, to_dt in job['windows']:
+                    futures[executor.submit(self.fetch, key[0], key[1], from_dt, to_dt)] = key
+                    job['pending'] += 1
+                    job['pages'] += 1
+
+            while futures:
+                done, _ = wait(futures, return_when = FIRST_COMPLETED)
+                for future in done:
+                    key = futures.pop(future)
+                    job = jobs[key]
+                    job['pending'] -= 1
+                    try:
+                        job['candles'].extend(future.result() or [])
+                    except Exception as e:
+                        job['failed'] = True
+                        self.stats['failed_requests'] += 1
+                        self.logging.error(f"Error in sync {key[1]} history for {key[0]}: {e}")
+
+                    if job['pending'] or job['failed']:
+                        continue
+
+                    config = self.intervals[key[1]]
+                    if job['windows'] is None and len(job['candles']) < config['required'] and job['pages'] < self.max_pages:
+                        # Holidays left the window short, page further back
+                        submit(key, 1)
+                        continue
+
+                    completed += 1
+                    results[key] = self.complete(key, job, completed, len(jobs))
+
+        for key, job in jobs.items():
+            if key not in results:
+                results[key] = False
+
+        for token in tokens:
+            for interval in derived:
+                ok = results.get((token, '5minute'), False)
+                if ok:
+                    ok = self.resampler.derive(token, self.intervals[interval]['table_name'],
+                                               current_time = current_time)
+                results[(token, interval)] = ok
+
+        self.log_summary(jobs, results, time.monotonic() - started_at, derived)
+        return results
+
+    def complete(self, key, job, position, total):
+        token, interval = key
+        config = self.intervals[interval]
+        saved = False
+        try:
+            if job['windows'] is None and len(job['candles']) < config['required']:
+                self.logging.error(f"Only {len(job['candles'])} {interval} candles found for {token} in {job['pages']} pages")
+            if job['windows'] is not None and not job['candles']:
+                # Nothing traded in the missing days, e.g. an unlisted holiday
+                saved = True
+            else:
+                saved = job['h_data'].save_candles(job['candles'], config['table_name'], config['generate_ids'])
+        except Exception as e:
+            self.logging.error(f"Error in saving {interval} history for {token}: {e}")
+            self.logging.error(traceback.format_exc())
+
+        job['seconds'] = time.monotonic() - job['started_at']
+        self.logging.info(f"[{position}/{total}] {interval} {token}: {len(job['candles'])} candles, "
+                          f"{job['pages']} pages, {job['seconds']:.2f}s {'ok' if saved else 'failed'}")
+        return saved
+
+    def log_summary(self, jobs, results, elapsed, derived = ()):
+        synced = [key for key, ok in results.items() if ok and key in jobs]
+        resampled = [key for key, ok in results.items() if ok and key[1] in derived]
+        failed = [key for key, ok in results.items() if not ok]
+        already = len(results) - len(jobs) - len([key for key in results if key[1] in derived])
+        limiter = self.limiter.get_stats()
+        self.logging.info(
+            f"History sync finished in {elapsed:.2f}s: {len(synced)} synced, {len(resampled)} derived from 5m, "
+            f"{already} already synced, {len(failed)} failed, {self.stats['requests']} requests, {self.stats['retries']} retries, "
+            f"{limiter['waited_seconds']:.2f}s waiting on the rate limit"
+        )
+        if failed:
+            self.logging.error(f"History sync failed for: {failed}")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['limiter'] = self.limiter.get_stats()
+        return stats
@@ -0,0 +1,187 @@
+import threading
+import traceback
+import numpy as np
+
+from moving_averages import StreamingSMA, StreamingRMA, true_range, rma
+from candlestick_patterns import is_shooting_star, is_hammer
+
+class Indicator:
+    __slots__ = ('name', 'inputs', 'window', 'compute', 'stream')
+
+    def __init__(self, name, inputs, window = None, compute = None, stream = None):
+        self.name = name
+        # Candle columns or other indicator names the values are computed from
+        self.inputs = inputs
+        # Bars a value looks back over, None when it depends on the whole history
+        self.window = window
+        # compute(df, start) -> values of rows start.. of df, vectorized over the whole frame
+        self.compute = compute
+        # Factory of a moving_averages streaming object, fed the appended bars
+        self.stream = stream
+
+class IndicatorRegistry:
+    """Indicator columns by name, cached per (token, timeframe, last bar).
+
+    Each indicator declares its inputs, so asking for ATR also brings in TR.
+    A new frame is computed with the vectorized functions. When it gains
+    bars only the new rows are computed: streaming indicators are fed the
+    new bars, windowed ones recompute their window over the tail. A recently fed bar coming back with different prices
+    invalidates the rows from that bar on, a reloaded frame everything.
+    """
+
+    definitions = {}
+    base_columns = ['open', 'high', 'low', 'close']
+
+    instance = None
+    instance_lock = threading.Lock()
+
+    def __init__(self, logging, lookback = 100):
+        self.logging = logging
+        # Fed bars kept to spot prices changing under the cache
+        self.lookback = lookback
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'appends': 0, 'recomputes': 0}
+
+    @classmethod
+    def shared(cls, logging):
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls(logging)
+            return cls.instance
+
+    @classmethod
+    def register(cls, name, inputs, window = None, compute = None, stream = None):
+        cls.definitions[name] = Indicator(name, inputs, window, compute, stream)
+
+    def resolve(self, names):
+        """Requested indicators and their dependencies, dependencies first."""
+        order = []
+
+        def visit(name, path):
+            if name in order or name in self.base_columns:
+                return
+            if name in path:
+                raise ValueError(f"Indicator dependency cycle: {' -> '.join(path + [name])}")
+            for dependency in self.definitions[name].inputs:
+                visit(dependency, path + [name])
+            order.append(name)
+
+        for name in names:
+            visit(name, [])
+        return order
+
+    def invalid_from(self, entry, keys, prices):
+        """First row whose cached values can't be reused."""
+        fed = entry['fed']
+        if fed == 0 or fed > len(keys) or keys[fed - 1] != entry['last_key']:
+            return 0
+        start = fed - len(entry['tail'])
+        changed = np.flatnonzero((prices[start:fed] != entry['tail']).any(axis = 1))
+        return start + int(changed[0]) if len(changed) else fed
+
+    def compute(self, df, indicator, entry):
+        name = indicator.name
+        cached = entry['columns'].get(name)
+        valid = 0 if cached is None else len(cached)
+        if valid == len(df):
+            return cached
+
+        if valid == 0:
+            # Whole frame in one vectorized pass, streams are only set up once bars get appended
+            entry['streams'].pop(name, None)
+            return np.asarray(indicator.compute(df, 0))
+
+        if indicator.stream is not None:
+            state = entry['streams'].get(name)
+            if state is None or state[1] != valid:
+                stream = indicator.stream()
+                stream.seed(df.iloc[:valid])
+                state = entry['streams'][name] = [stream, valid]
+
+            stream = state[0]
+            inputs = {column: df[column].to_numpy() for column in indicator.inputs}
+            values = [stream.update({column: inputs[column][position] for column in inputs})
+                      for position in range(valid, len(df))]
+            state[1] = len(df)
+            return np.concatenate((cached, np.asarray(values, dtype = cached.dtype)))
+
+        start = max(0, valid - indicator.window + 1)
+        values = np.asarray(indicator.compute(df.iloc[start:], valid - start))
+        return np.concatenate((cached, values.astype(cached.dtype)))
+
+    def apply(self, df, token, timeframe, names):
+        """Add the named indicator columns (and their inputs) to df and return it."""
+        if df is None or df.empty:
+            return df
+
+        try:
+            order = self.resolve(names)
+        except (KeyError, ValueError) as e:
+            self.logging.error(f"Unknown indicator requested for {token} {timeframe}: {e}")
+            return df
+
+        keys = df['unique_key'].to_numpy()
+        prices = np.column_stack([df[column].to_numpy(dtype = float) for column in self.base_columns])
+
+        with self.lock:
+            entry = self.entries.get((token, timeframe))
+            if entry is None:
+                entry = self.entries[(token, timeframe)] = {
+                    'last_key': None, 'fed': 0, 'tail': None, 'columns': {}, 'streams': {}, 'lock': threading.Lock()
+                }
+
+        with entry['lock']:
+            try:
+                invalid_from = self.invalid_from(entry, keys, prices)
+                if invalid_from < entry['fed']:
+                    # Cached values from the first changed bar on are stale for every indicator
+                    entry['columns'] = {name: column[:invalid_from] for name, column in entry['columns'].items()}
+                    self.stats['recomputes'] += 1
+                elif invalid_from < len(df):
+                    self.stats['appends'] += 1
+                else:
+                    self.stats['hits'] += 1
+
+                for name in order:
+                    column = self.compute(df, self.definitions[name], entry)
+                    entry['columns'][name] = column
+                    df[name] = column.copy()
+
+                entry['fed'] = len(df)
+                entry['last_key'] = keys[-1]
+                entry['tail'] = prices[-self.lookback:].copy()
+            except Exception as e:
+                self.logging.error(f"Error in computing indicators {names} for {token} {timeframe}: {e}")
+                self.logging.error(traceback.format_exc())
+                with self.lock:
+                    self.entries.pop((token, timeframe), None)
+        return df
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+        return stats
+
+
+def pattern(function):
+    # Candlestick pattern functions take (position, frame)
+    return lambda df, start: np.array([bool(function(position, df)) for position in range(start, len(df))], dtype = bool)
+
+def rolling_mean(column, window):
+    # Same values as the moving_average_*sma helpers
+    return lambda df, start: df[column].rolling(window = window).mean().round(2).to_numpy(dtype = float)[start:]
+
+for window, column, name in [(9, 'close', 'SMA-9'), (15, 'close', 'SMA-15'), (20, 'close', 'SMA-20'),
+                             (50, 'close', 'SMA-50'), (200, 'close', 'SMA-200'),
+                             (9, 'high', 'SMA-9-h'), (9, 'low', 'SMA-9-l')]:
+    IndicatorRegistry.register(name, [column], window, compute = rolling_mean(column, window),
+                               stream = lambda window = window, column = column: StreamingSMA(window, column))
+
+IndicatorRegistry.register('TR', ['high', 'low', 'close'], 2, compute = lambda df, start: true_range(df)[start:])
+# Unrounded, the same values as average_true_range
+IndicatorRegistry.register('ATR', ['TR'], compute = lambda df, start: rma(df['TR'].to_numpy(dtype = float), 14)[start:],
+                           stream = lambda: StreamingRMA(14, 'TR', decimals = None))
+IndicatorRegistry.register('shooting_star', ['open', 'high', 'low', 'close'], 2, compute = pattern(is_shooting_star))
+IndicatorRegistry.register('is_hammer', ['open', 'high', 'low', 'close'], 2, compute = pattern(is_hammer))
@@ -8,6 +8,9 @@ from common import Util
 from order import MarketOrder
 from db_connect import PostgresDB
 from historetical_data import HistoricalData
+from candle_resampler import CandleResampler
+from historical_cache import HistoricalCache
+from indicator_registry import IndicatorRegistry
 
 class Instrument:
 
@@ -21,11 +24,11 @@ class Instrument:
         self.orders = {} 
         self.historical_data_5m = None
         self.historical_data_30m = None
+        self.indicators_5m = ['SMA-200', 'SMA-20', 'SMA-9']
         self.low_margin_at = None
         self.db_conn = PostgresDB(setting, logging)
         self.momentum_result = {}
         self.current_data_analysis = {}
-        self.premium_data = {}
         self.last_order_key = None
         self.market_trend = {'low': None, 'high': None, 'direction': None, 'change': False}
 
@@ -38,7 +41,13 @@ class Instrument:
         self.historical_data_5m  = historical_data.load_5min_data(unique_key)
         self.historical_data_30m = historical_data.load_30min_data()
 
-    def refresh_data(self, kite_login, current_time):
+    def fetch_5m_candles(self, kite_login, live_data, token, from_dt, to_dt):
+        if live_data is None:
+            return HistoricalCache.shared(self.logging).fetch(kite_login, token, from_dt, to_dt, "5minute")
+        # Built from live ticks, REST is only hit to repair gaps
+        return live_data.candle_builder.fetch_candles(kite_login, token, from_dt, to_dt)
+
+    def refresh_data(self, kite_login, current_time, live_data = None):
         end_dt = datetime(current_time.year, current_time.month, current_time.day, 15, 30)
         if current_time > end_dt:
             current_time = end_dt
@@ -55,24 +64,35 @@ class Instrument:
                 to_dt = from_dt + timedelta(minutes = candle_count * 5)
                 if from_dt < to_dt:
                     try:
-                        historical_data = HistoricalData(self.setting, self.token, self.logging)
-                        data_df = historical_data.load_5m_current_data(from_dt, to_dt)
-                        if data_df.empty:
-                            data = kite_login.conn.historical_data(self.token, from_dt, to_dt, "5minute")
-                            data_df = pd.DataFrame(data)
+                        candles = None
+                        if live_data is not None:
+                            live_data.candle_builder.close_bars(to_dt)
+                            candles = live_data.candle_builder.get_candles(self.token, from_dt, to_dt)
+
+                        if candles is not None:
+                            data_df = pd.DataFrame(candles)
+                        else:
+                            historical_data = HistoricalData(self.setting, self.token, self.logging)
+                            data_df = historical_data.load_5m_current_data(from_dt, to_dt)
+                            if data_df.empty:
+                                data = self.fetch_5m_candles(kite_login, live_data, self.token, from_dt, to_dt)
+                                data_df = pd.DataFrame(data)
      
                         if len(data_df) == candle_count:
                             data_df = data_df.drop(columns=["volume"]) if 'volume' in data_df.columns else data_df
 
-                            data_df['date'] = data_df.apply(lambda row: Util.parse_datetime(row["date"]), axis=1)
-                            data_df["unique_key"] = data_df.apply(lambda row: Util.generate_5m_id(row["date"]), axis=1)
-                            data_df["token"]      = data_df.apply(lambda row: self.token, axis = 1)
+                            data_df['date'] = Util.parse_datetimes(data_df['date'])
+                            data_df["unique_key"] = Util.generate_5m_ids(data_df["date"])
+                            data_df["token"]      = self.token
                             threshold = Util.generate_id(from_dt)
                             self.historical_data_5m.drop(self.historical_data_5m[self.historical_data_5m['unique_key'] >= threshold].index, inplace=True)
                             self.historical_data_5m = pd.concat([self.historical_data_5m, data_df], ignore_index=True)
-                            self.historical_data_5m["SMA-200"] = moving_average_close_200sma(self.historical_data_5m)
-                            self.historical_data_5m["SMA-20"] = moving_average_close_20sma(self.historical_data_5m)
-                            self.historical_data_5m["SMA-9"] = moving_average_close_9sma(self.historical_data_5m)
+                            # Only the bars appended since the last refresh are computed
+                            self.historical_data_5m = IndicatorRegistry.shared(self.logging).apply(
+                                self.historical_data_5m, self.token, '5minute', self.indicators_5m)
+                            # Roll the 30m bars forward from the 5m ones that just closed
+                            self.historical_data_30m = CandleResampler(self.setting, self.logging).update(
+                                self.historical_data_30m, self.historical_data_5m, 30, from_dt)
                             self.refresh_till_5m = to_dt
                             self.logging.info(f"Refreshed 5m data for {self.token} till {self.refresh_till_5m}")
                     except Exception as e:
@@ -114,16 +134,15 @@ class Instrument:
                 
     def load_current_data_analysis(self, live_data, instrument_token, current_date):
         analyser = live_data.analyser
-        momentum = analyser.analyse_oi_momentum(instrument_token, live_data, self.order_ids())
-
-        if momentum is None:
-            return None
-
         token_data = live_data.get_current_data(self.token)
         strike_price_tokens = self.get_ce_pe_tokens(instrument_token, token_data)
         if strike_price_tokens is None:
             return None
 
+        momentum = analyser.analyse_oi_momentum(strike_price_tokens, instrument_token, live_data, self.order_ids())
+        if momentum is None:
+            return None
+
         ce_token = strike_price_tokens['curr_ce_token']
         pe_token = strike_price_tokens['curr_pe_token']
         ce_token_data = live_data.get_current_data(ce_token)
@@ -382,6 +401,9 @@ class Instrument:
                 candle_5m['unique_key'] == self.momentum_result['unique_key']
             )
             if check_unique_key and self.current_data_analysis: 
+                # Cached per last bar, so this only computes what another path left out
+                self.historical_data_5m = IndicatorRegistry.shared(self.logging).apply(
+                    self.historical_data_5m, self.token, '5minute', self.indicators_5m)
                 candle_5m = self.historical_data_5m.iloc[-1]
                 prev_candle_5m = self.historical_data_5m.iloc[-2]
 
@@ -459,13 +481,8 @@ class Instrument:
             to_dt = from_dt + timedelta(minutes = candle_count * 5)
             from_dt = to_dt - timedelta(minutes=15)
 
-            key = '-'.join([str(self.momentum_result['unique_key']), str(ce_token)])
-            if key not in self.premium_data:
-                self.premium_data.clear()
-                ce_data = kite_login.conn.historical_data(ce_token, from_dt, to_dt, "5minute")
-                self.premium_data[key] = pd.DataFrame(ce_data)
-
-            ce_data_df = self.premium_data[key]
+            # Repeated calls within the bar are served by the shared historical cache
+            ce_data_df = pd.DataFrame(self.fetch_5m_candles(kite_login, live_data, ce_token, from_dt, to_dt))
             
             if not ce_data_df.empty:
                 parent_candle = self.historical_data_5m.iloc[-1]  # Last 5m candle
@@ -517,13 +534,8 @@ class Instrument:
             to_dt = from_dt + timedelta(minutes = candle_count * 5)
             from_dt = to_dt - timedelta(minutes=15)
 
-            key = '-'.join([str(self.momentum_result['unique_key']), str(pe_token)])
-            if key not in self.premium_data:
-                self.premium_data.clear()
-                pe_data = kite_login.conn.historical_data(pe_token, from_dt, to_dt, "5minute")
-                self.premium_data[key] = pd.DataFrame(pe_data)
-
-            pe_data_df = self.premium_data[key]
+            # Repeated calls within the bar are served by the shared historical cache
+            pe_data_df = pd.DataFrame(self.fetch_5m_candles(kite_login, live_data, pe_token, from_dt, to_dt))
             
             if not pe_data_df.empty:
                 parent_candle = self.historical_data_5m.iloc[-1]  # Last 5m candle
@@ -576,13 +588,8 @@ class Instrument:
                 to_dt = from_dt + timedelta(minutes = candle_count * 5)
                 from_dt = to_dt - timedelta(minutes=15)
     
-                key = '-'.join([str(self.momentum_result['unique_key']), str(ce_token)])
-                if key not in self.premium_data:
-                    self.premium_data.clear()
-                    ce_data = kite_login.conn.historical_data(ce_token, from_dt, to_dt, "5minute")
-                    self.premium_data[key] = pd.DataFrame(ce_data)
-    
-                ce_data_df = self.premium_data[key]
+                # Repeated calls within the bar are served by the shared historical cache
+                ce_data_df = pd.DataFrame(self.fetch_5m_candles(kite_login, live_data, ce_token, from_dt, to_dt))
                 
                 if not ce_data_df.empty:
                     parent_candle = self.historical_data_5m.iloc[-1]  # Last 5m candle
@@ -629,13 +636,8 @@ class Instrument:
             to_dt = from_dt + timedelta(minutes = candle_count * 5)
             from_dt = to_dt - timedelta(minutes=15)
 
-            key = '-'.join([str(self.momentum_result['unique_key']), str(pe_token)])
-            if key not in self.premium_data:
-                self.premium_data.clear()
-                pe_data = kite_login.conn.historical_data(pe_token, from_dt, to_dt, "5minute")
-                self.premium_data[key] = pd.DataFrame(pe_data)
-
-            pe_data_df = self.premium_data[key]
+            # Repeated calls within the bar are served by the shared historical cache
+            pe_data_df = pd.DataFrame(self.fetch_5m_candles(kite_login, live_data, pe_token, from_dt, to_dt))
             
             if not pe_data_df.empty:
                 parent_candle = self.historical_data_5m.iloc[-1]  # Last 5m candle
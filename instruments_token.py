@@ -1,4 +1,5 @@
 import re
+import threading
 from datetime import datetime, timedelta
 
 class InstrumentToken:  # Fixed typo from "IntrumentToken"
@@ -7,7 +8,9 @@ class InstrumentToken:  # Fixed typo from "IntrumentToken"
         self.instrument_tokens = None
         self.setting = setting
         self.logging = logging
-        self.selected_tokens = None
+        # Latest strike selection per underlying token, each one built whole before it's published
+        self.selected_tokens = {}
+        self.lock = threading.Lock()
 
     def load_instrument_tokens(self, kite_login):
         if self.instrument_tokens is None:
@@ -34,8 +37,10 @@ class InstrumentToken:  # Fixed typo from "IntrumentToken"
             strikes = list(set(strikes))  # Remove duplicates if needed
     
         # Check if strikes match previously selected tokens
-        if self.selected_tokens and set(strikes) == set(self.selected_tokens.get('strikes', [])):
-            return self.selected_tokens
+        with self.lock:
+            previous = self.selected_tokens.get(token)
+        if previous and set(strikes) == set(previous.get('strikes', [])):
+            return previous
             
         strikes_pattern = "|".join(map(str, strikes))
 
@@ -71,7 +76,7 @@ class InstrumentToken:  # Fixed typo from "IntrumentToken"
             re_ex = re_ex_days if has_days else re_ex_month
     
         # Initialize token storage
-        self.selected_tokens = {
+        selected_tokens = {
             'token_list': [],
             'nearest_pre_strike': nearest_strike - strike_step, 
             'nearest_strike': nearest_strike, 
@@ -84,26 +89,28 @@ class InstrumentToken:  # Fixed typo from "IntrumentToken"
             'curr_pe_token': None
         }
         for strike in strikes:
-            self.selected_tokens[strike] = {'CE': None, 'PE': None}
+            selected_tokens[strike] = {'CE': None, 'PE': None}
     
         # Match and assign tokens
         for item in self.instrument_tokens:
             if re.match(re_ex, item["tradingsymbol"]):
                 strike = int(item['strike'])
-                self.selected_tokens['strikes'].append(strike)
+                selected_tokens['strikes'].append(strike)
                 option_type = 'CE' if item["tradingsymbol"].endswith('CE') else 'PE'
-                self.selected_tokens[strike][option_type] = item
-                self.selected_tokens['token_list'].append(item["instrument_token"])
+                selected_tokens[strike][option_type] = item
+                selected_tokens['token_list'].append(item["instrument_token"])
                 if option_type == 'CE':
-                    self.selected_tokens['ce_tokens'][item["instrument_token"]] = item
+                    selected_tokens['ce_tokens'][item["instrument_token"]] = item
                 elif option_type == 'PE':
-                    self.selected_tokens['pe_tokens'][item["instrument_token"]] = item
+                    selected_tokens['pe_tokens'][item["instrument_token"]] = item
                 if strike == nearest_strike and option_type == 'CE':
-                    self.selected_tokens['curr_ce_token'] = item["instrument_token"]
+                    selected_tokens['curr_ce_token'] = item["instrument_token"]
                 elif strike == nearest_strike + strike_step and option_type == 'PE':
-                    self.selected_tokens['curr_pe_token'] = item["instrument_token"]
-                
-        return self.selected_tokens
+                    selected_tokens['curr_pe_token'] = item["instrument_token"]
+
+        with self.lock:
+            self.selected_tokens[token] = selected_tokens
+        return selected_tokens
 
     def get_token_by_symbol(self, symbol):
         tokens = [item["instrument_token"] for item in self.instrument_tokens if re.match(symbol, item["tradingsymbol"])]
@@ -4,48 +4,33 @@ import pandas as pd
 from datetime import datetime, timedelta
 
 from momentum_analyser import MomentumAnalyser
+from live_state import LiveStateStore
+from candle_builder import CandleBuilder
 
 class LiveData:
     def __init__(self, setting, logging):  # Fixed constructor
         self.logging = logging
-        self.instruments_data = {}  # Initialized as an empty dictionary
+        self.store = LiveStateStore()
+        self.candle_builder = CandleBuilder(logging)
         self.order_updated = False
         self.analyser = MomentumAnalyser(setting, logging)
         
     def collect_instruments_data(self, ticks):
         self.analyser.load_ticks(ticks)
-        max_len = 5
-        
-        for tick in ticks:
-            token = tick["instrument_token"]
-            price = tick["last_price"]
-        
-            oi = tick['oi'] if 'oi' in tick else 0
-            
-            if token not in self.instruments_data:
-                self.instruments_data[token] = {}
-    
-            self.instruments_data[token]['price'] = price
-            self.instruments_data[token]['time'] = datetime.now()  # Update time on new data
-            self.instruments_data[token]['volume_traded'] = 0
-            self.instruments_data[token]['oi'] = oi
-            self.instruments_data[token]['bid_volume'] = 0
-            self.instruments_data[token]['offer_volume'] = 0
+        self.store.update_ticks(ticks)
+        self.candle_builder.update_ticks(ticks)
 
     def to_s(self):
         flag = 1
-        # df = pd.DataFrame.from_dict(self.instruments_data, orient="index")
-        # df.reset_index(drop=True, inplace=True)
+        # df = self.store.to_frame()
         # if len(df) > 0:
         #     print('---------------------------------------------------------')
         #     print(df)
         #     print('---------------------------------------------------------')
         
     def get_current_data(self, token):  # Added `self`
-        if self.instruments_data is not None and token in self.instruments_data:
-            if (datetime.now() - self.instruments_data[token]['time']) <= timedelta(minutes=2): 
-                return self.instruments_data[token]
-        return None
+        # Fresh (updated within 2 minutes) view of the token, else None
+        return self.store.get(token)
 
         
     # def get_current_pattern(token, time_id):
@@ -0,0 +1,113 @@
+import time
+import numpy as np
+import pandas as pd
+
+class TokenState:
+    """Read-only view of one token's slot; behaves like the old per-token dict."""
+
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+
+    def __getitem__(self, key):
+        if key not in LiveStateStore.columns:
+            raise KeyError(key)
+        return getattr(self.store, key)[self.slot].item()
+
+    def __contains__(self, key):
+        return key in LiveStateStore.columns
+
+    def get(self, key, default = None):
+        return self[key] if key in LiveStateStore.columns else default
+
+class LiveStateStore:
+    """Array-backed latest state per token, indexed through a token -> slot map."""
+
+    columns = {
+        'price': np.float64,
+        'oi': np.int64,
+        'volume_traded': np.int64,
+        'bid_volume': np.int64,
+        'offer_volume': np.int64,
+        'updated_ns': np.int64
+    }
+
+    def __init__(self, capacity = 256, max_age = 120):
+        self.capacity = capacity
+        self.max_age_ns = int(max_age * 1_000_000_000)
+        self.index = {}
+        self.tokens = np.zeros(capacity, dtype = np.int64)
+        self.views = []
+        for name, dtype in self.columns.items():
+            setattr(self, name, np.zeros(capacity, dtype = dtype))
+
+    def __len__(self):
+        return len(self.views)
+
+    def add_token(self, token):
+        slot = len(self.views)
+        if slot == self.capacity:
+            self.grow(self.capacity * 2)
+
+        self.tokens[slot] = token
+        self.views.append(TokenState(self, slot))
+        self.index[token] = slot
+        return slot
+
+    def grow(self, capacity):
+        # Copy before swapping so a reader never sees a half-filled array
+        for name in ['tokens'] + list(self.columns):
+            current = getattr(self, name)
+            resized = np.zeros(capacity, dtype = current.dtype)
+            resized[:self.capacity] = current
+            setattr(self, name, resized)
+        self.capacity = capacity
+
+    def update_ticks(self, ticks):
+        now = time.monotonic_ns()
+        index = self.index
+
+        for tick in ticks:
+            token = tick['instrument_token']
+            slot = index.get(token)
+            if slot is None:
+                slot = self.add_token(token)
+
+            self.price[slot] = tick['last_price']
+            self.oi[slot] = tick.get('oi', 0)
+            self.volume_traded[slot] = tick.get('volume_traded', 0)
+            depth = tick.get('depth')
+            if depth:
+                self.bid_volume[slot] = sum(level['quantity'] for level in depth['buy'])
+                self.offer_volume[slot] = sum(level['quantity'] for level in depth['sell'])
+            self.updated_ns[slot] = now
+
+    def get(self, token):
+        """Return the token's view if it has been updated within max_age, else None."""
+        slot = self.index.get(token)
+        if slot is None or time.monotonic_ns() - self.updated_ns[slot] > self.max_age_ns:
+            return None
+        return self.views[slot]
+
+    def slots_for(self, tokens):
+        """Slot index per token, -1 for tokens never seen."""
+        index = self.index
+        return np.fromiter((index.get(token, -1) for token in tokens), dtype = np.int64, count = len(tokens))
+
+    def fresh_mask(self, slots):
+        updated = self.updated_ns[np.where(slots >= 0, slots, 0)]
+        return (slots >= 0) & (updated > 0) & (time.monotonic_ns() - updated <= self.max_age_ns)
+
+    def read(self, name, slots, fill = 0):
+        """Column values for `slots`; unknown or stale tokens read as `fill`."""
+        values = getattr(self, name)[np.where(slots >= 0, slots, 0)]
+        return np.where(self.fresh_mask(slots), values, fill)
+
+    def to_frame(self):
+        size = len(self.views)
+        data = {'token': self.tokens[:size]}
+        for name in self.columns:
+            data[name] = getattr(self, name)[:size]
+        return pd.DataFrame(data)
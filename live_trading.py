@@ -2,9 +2,11 @@
 
 import re
 import sys
+import atexit
 import json
 import time
 import logging
+import threading
 import traceback
 import warnings
 from datetime import datetime, timedelta
@@ -17,6 +19,10 @@ from common import Util
 from instrument import Instrument
 from instruments_token import InstrumentToken
 from order_handler import OrderHandler
+from event_scheduler import EventScheduler
+from pipeline_executor import PipelineExecutor
+from tick_partitions import TickPartitionManager
+from historical_cache import HistoricalCache
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO,
 	format="%(asctime)s[%(levelname)s] - %(message)s")
@@ -34,7 +40,14 @@ if kite_login.conn is None:
     logging.error("Unable to make kite connection")
     exit()
 
+# Today's and the next trading day's tick partitions must exist before ticks are written
+TickPartitionManager(setting, logging).maintain()
+
 live_data = LiveData(setting, logging)
+scheduler = EventScheduler(logging)
+
+# Flush buffered ticks to tick_details on any exit path
+atexit.register(live_data.analyser.tick_writer.stop)
 
 # Initialise
 # connect_timeout= 60*10 (10 minutes)
@@ -46,6 +59,7 @@ def on_ticks(ws, ticks):
     # Callback to receive ticks.
     # print("Ticks: {}".format(ticks))
     live_data.collect_instruments_data(ticks)
+    scheduler.notify(EventScheduler.TICK)
     
 def on_connect(ws, response):
     logging.info("on_connect: ".format(response))
@@ -58,6 +72,7 @@ def on_connect(ws, response):
     
 def on_order_update(ws, data):
     live_data.order_updated = True
+    scheduler.notify(EventScheduler.ORDER_UPDATE)
     logging.info("on_order_update: {}".format(data))
     
 def on_close(ws, code, reason):
@@ -140,6 +155,23 @@ def subscribe_strike_price_tokens(token):
     return subscribe_tokens
        
 
+def instrument_pipeline(instrument, current_time, bar_stage, tick_stage):
+    # Runs on a pipeline worker, one underlying per call
+    try:
+        if bar_stage:
+            instrument.refresh_data(kite_login, current_time, live_data)
+            instrument.load_momentum_analysis(kite_login, live_data, instrument_token, current_time)
+        if tick_stage:
+            instrument.load_current_data_analysis(live_data, instrument_token, current_time)
+            instrument.print_analysis_details()
+            if not instrument.order_ids():
+                instrument.execute_trade_opportunity(kite_login, live_data, instrument_token, current_time)
+    except Exception as e:
+        if re.match('Error in connecting kite connect', str(e)):
+            # Workers share the session, the main loop reconnects once
+            reconnect_requested.set()
+        raise
+
 def trading_windows(current_time):
     from_dt = datetime(current_time.year, current_time.month, current_time.day, 6, 0)
     to_dt = datetime(current_time.year, current_time.month, current_time.day, 15, 31)
@@ -162,10 +194,17 @@ except Exception as e:
     logging.error(traceback.format_exc())
     exit()
 
+pipeline_executor = PipelineExecutor(setting, logging)
+reconnect_requested = threading.Event()
+atexit.register(pipeline_executor.shutdown)
+atexit.register(lambda: logging.info(f"Historical cache: {HistoricalCache.shared(logging).get_stats()}"))
+
 # Main loop
 subscribed_list = []
 
 while True:
+    # Blocks until ticks arrive, a 5m bar closes, an order updates or the heartbeat is due
+    events = scheduler.wait()
     current_time = datetime.now()
     
     if not trading_windows(current_time):
@@ -179,47 +218,68 @@ while True:
         logging.info("Main thread: Waiting for Trading session start")
         time.sleep(30)
         continue
-        
-    subscribed_list.clear()
 
-    print("============================================ * In Trading session * =================================================")
-    logging.info(f"Time: {current_time}")
+    bar_closed = EventScheduler.BAR_CLOSE in events
+    housekeeping = bar_closed or EventScheduler.HEARTBEAT in events
+    ticked = EventScheduler.TICK in events
+    order_updated = EventScheduler.ORDER_UPDATE in events
+
+    if housekeeping:
+        print("============================================ * In Trading session * =================================================")
+    logging.info(f"Time: {current_time}, events: {sorted(events)}")
     
     live_data.to_s()
 
+    if reconnect_requested.is_set():
+        reconnect_requested.clear()
+        kite_login.connect()
+
     if kws.is_connected():
         try:
-            tokens = setting.reload().get_securities_tokens()
-
-            kws.subscribe(tokens)
-            kws.set_mode(kws.MODE_FULL, tokens)
-            subscribed_list.extend(tokens)
-            
-            for token in tokens:
-                reload_data(token, unique_key)
+            # Stragglers may still be placing orders, their instruments are left alone until they finish
+            busy = pipeline_executor.running()
+            idle_instruments = {token: instrument for token, instrument in instruments.items() if token not in busy}
+            if busy:
+                logging.warning(f"Order management skipped for running pipelines: {sorted(busy)}")
+
+            if housekeeping:
+                subscribed_list.clear()
+                tokens = setting.reload().get_securities_tokens()
+
+                kws.subscribe(tokens)
+                kws.set_mode(kws.MODE_FULL, tokens)
+                subscribed_list.extend(tokens)
                 
-                subscribed_strike_price_tokens = subscribe_strike_price_tokens(token)
-                if subscribed_strike_price_tokens:
-                    subscribed_list.extend(subscribed_strike_price_tokens)
-
-            positions_reloaded = order_handler.reload_positions(instruments)
+                for token in tokens:
+                    reload_data(token, unique_key)
+                    
+                    subscribed_strike_price_tokens = subscribe_strike_price_tokens(token)
+                    if subscribed_strike_price_tokens:
+                        subscribed_list.extend(subscribed_strike_price_tokens)
+
+            if order_updated:
+                # Skip the 30s positions throttle, the update may have opened or closed one
+                order_handler.position_loaded_at = None
+
+            positions_reloaded = order_handler.reload_positions(idle_instruments)
             if positions_reloaded is not None:
-                if not setting.manage_position:
+                if housekeeping and not setting.manage_position:
                     logging.warn('Note: Manage position is disabled.')
                 if positions_reloaded and setting.manage_position:
-                    if order_handler.fill_orders(instruments) is True:
-                        order_handler.manage_orders(instruments, live_data)
-
-                for token in instruments.keys():
-                    instruments[token].refresh_data(kite_login, current_time)
-                    instruments[token].load_momentum_analysis(kite_login, live_data, instrument_token, current_time)
-                    instruments[token].load_current_data_analysis(live_data, instrument_token, current_time)
-                    instruments[token].print_analysis_details()
-                    if not instruments[token].order_ids():
-                        instruments[token].execute_trade_opportunity(kite_login, live_data, instrument_token, current_time)
-
-            live_data.analyser.load_current_data(current_time)
-            order_handler.cancel_invalid_sl_orders(live_data, instruments)
+                    if order_handler.fill_orders(idle_instruments) is True:
+                        order_handler.manage_orders(idle_instruments, live_data)
+
+                if housekeeping or ticked:
+                    pipeline_executor.run(instruments, lambda token, instrument: instrument_pipeline(
+                        instrument, current_time, housekeeping, ticked or bar_closed
+                    ))
+
+            if ticked or housekeeping:
+                live_data.analyser.load_current_data(current_time)
+            # Needs every instrument's orders, a running pipeline may be about to own one of the SLs.
+            # live_data.order_updated stays set, so the next heartbeat retries.
+            if (order_updated or housekeeping) and not pipeline_executor.running():
+                order_handler.cancel_invalid_sl_orders(live_data, instruments)
             
             # Unsubscribe unused tokens
             # unused_tokens = set(kws.subscribed_tokens.keys()) - set(subscribed_list)
@@ -232,5 +292,3 @@ while True:
     else:
         kws.close()
         kws.connect(threaded=True)
-    
-    time.sleep(4)  # Main loop delay 10 sec
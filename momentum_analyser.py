@@ -1,67 +1,101 @@
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
 import pandas as pd
 import traceback
 
 from common import Util
 from db_connect import PostgresDB
+from tick_writer import TickWriter
+from tick_buffer import TickRingBuffer
+from oi_tracker import OiTrendTracker
+from option_chain import OptionChainSnapshot
 
 class MomentumAnalyser:
     def __init__(self, setting, logging):
-        self.ticks_data = []
+        self.tick_buffer = TickRingBuffer()
+        self.reported_overflow = 0
         self.current_data_df = pd.DataFrame(columns=['token', 'unique_key', 'date', 'last_price', 'oi', 'quantity'])
         self.db_conn = PostgresDB(setting, logging)
+        self.tick_writer = TickWriter(setting, logging)
+        self.oi_tracker = OiTrendTracker()
+        # Instrument pipelines read the tracker from worker threads
+        self.oi_lock = threading.Lock()
         self.logging = logging
+        self.register_queries()
+
+    def register_queries(self):
+        # Momentum and OI reads go to the 5-minute bars, ~75 rows per token per day
+        PostgresDB.register_query('fetch_records', """
+            SELECT token, unique_key, date, last_price, last_oi AS oi, volume_traded
+            FROM tick_oi_5m
+            WHERE token = ANY($1) AND unique_key >= $2 AND unique_key <= $3
+            ORDER BY token, unique_key
+        """, ['bigint[]', 'bigint', 'bigint'])
+
+        PostgresDB.register_query('fetch_oi_records', """
+            SELECT token, unique_key, last_oi AS oi
+            FROM tick_oi_5m
+            WHERE unique_key >= $1 AND unique_key <= $2
+            ORDER BY token, unique_key
+        """, ['bigint', 'bigint'])
+
+        PostgresDB.register_query('fetch_oi_records_tokens', """
+            SELECT token, unique_key, last_oi AS oi
+            FROM tick_oi_5m
+            WHERE token = ANY($3) AND unique_key >= $1 AND unique_key <= $2
+            ORDER BY token, unique_key
+        """, ['bigint', 'bigint', 'bigint[]'])
+
+        PostgresDB.register_query('fetch_ticks_data', """
+            SELECT token, date, last_price, oi, volume_traded, bid_volume, offer_volume
+            FROM tick_details
+            WHERE date >= $1 AND date < $2
+            ORDER BY created_at
+        """, ['timestamp', 'timestamp'])
 
     def load_ticks(self, ticks):
-        self.ticks_data.extend(ticks)
+        # Runs on the KiteTicker thread
+        self.tick_buffer.push_many(ticks)
             
         
     def load_current_data(self, current_time, should_save = True):
-        ticks_data = self.ticks_data.copy()
-
-        if self.trading_windows(current_time):
-            for tick in ticks_data:
-                if 'exchange_timestamp' not in tick:
-                    self.logging.error("exchange_timestamp missing")
-                    continue
-                    
-                timestamp = tick['exchange_timestamp']
-                
-                token = tick['instrument_token']
-                last_price = tick['last_price']
-                oi = tick['oi'] if 'oi' in tick else 0
-                volume_traded = tick['volume_traded'] if 'volume_traded' in tick else 0
-                
-                bid_volume, offer_volume = self.fetch_bid_offer_volume(tick)
-                time = datetime(timestamp.year, timestamp.month, timestamp.day, timestamp.hour, timestamp.minute, timestamp.second)
-
-                # Generate a unique key (not used yet in the DataFrame)
-                unique_key = Util.generate_5m_id(time)
+        if not self.trading_windows(current_time):
+            self.tick_buffer.discard()
+            return
+
+        if self.tick_buffer.overflowed > self.reported_overflow:
+            self.reported_overflow = self.tick_buffer.overflowed
+            self.logging.warning(f"Tick buffer overflowed: {self.tick_buffer.get_stats()}")
+
+        with self.oi_lock:
+            if self.oi_tracker.day != current_time.date():
+                self.seed_oi_tracker(current_time)
+
+        for tick in self.tick_buffer.drain():
+            if 'exchange_timestamp' not in tick:
+                self.logging.error("exchange_timestamp missing")
+                continue
                 
-                # Create DataFrame with a single row
-                df = pd.DataFrame([{
-                    'token': token,
-                    'unique_key': unique_key,
-                    'date': time,
-                    'last_price': last_price,
-                    'oi': oi,
-                    'volume_traded': volume_traded,
-                    'bid_volume': bid_volume,
-                    'offer_volume': offer_volume
-                }])
-    
-                if should_save:
-                    self.save_data_to_db(df)
-    
-                # self.current_data_df = pd.concat([self.current_data_df, df], ignore_index=True)
+            timestamp = tick['exchange_timestamp']
             
-        del self.ticks_data[0:len(ticks_data)]
-        ticks_data.clear()
-
-    def analyse_oi_momentum(self, instrument_token, live_data, order_tokens):
+            token = tick['instrument_token']
+            last_price = tick['last_price']
+            oi = tick['oi'] if 'oi' in tick else 0
+            volume_traded = tick['volume_traded'] if 'volume_traded' in tick else 0
+            
+            bid_volume, offer_volume = self.fetch_bid_offer_volume(tick)
+            time = datetime(timestamp.year, timestamp.month, timestamp.day, timestamp.hour, timestamp.minute, timestamp.second)
+            with self.oi_lock:
+                self.oi_tracker.update(token, oi)
+
+            if should_save:
+                self.tick_writer.put((
+                    token, Util.generate_5m_id(time), time, last_price,
+                    oi, volume_traded, bid_volume, offer_volume
+                ))
+
+    def analyse_oi_momentum(self, selected_tokens, instrument_token, live_data, order_tokens):
         order_strikes = []
-        instruments_data = live_data.instruments_data
-        selected_tokens = instrument_token.selected_tokens
         if order_tokens:
             order_strikes = instrument_token.get_strike_price(order_tokens)
         
@@ -72,70 +106,33 @@ class MomentumAnalyser:
         nearest_strike = selected_tokens.get('nearest_strike', -1)
         next_strike = selected_tokens.get('next_strike', -1)
         next_pre_strike = selected_tokens.get('next_pre_strike', -1)
-
-        ce_pe_pre_nearest = selected_tokens.get(nearest_pre_strike, {'PE': {}, 'CE': {}})
-        ce_pe_nearest = selected_tokens.get(nearest_strike, {'PE': {}, 'CE': {}})
-        ce_pe_next = selected_tokens.get(next_strike, {'PE': {}, 'CE': {}})
-        ce_pe_pre_next = selected_tokens.get(next_pre_strike, {'PE': {}, 'CE': {}})
-
         order_strike = order_strikes[0] if order_strikes else None 
-        ce_pe_order = selected_tokens.get(order_strike, {'PE': {}, 'CE': {}})
 
-        nearest_pre_ce_oi = nearest_pre_pe_oi = next_pre_ce_oi = next_pre_pe_oi = 0.0
-        nearest_ce_oi = nearest_pe_oi = next_ce_oi = next_pe_oi = order_ce_oi = order_pe_oi = 0.0
-        
-        if ce_pe_pre_nearest['PE'] and ce_pe_pre_nearest['CE']:  
-            nearest_pre_ce_data = live_data.get_current_data(ce_pe_pre_nearest['CE']['instrument_token'])
-            nearest_pre_pe_data = live_data.get_current_data(ce_pe_pre_nearest['PE']['instrument_token'])
-            nearest_pre_ce_oi = nearest_pre_ce_data['oi'] if nearest_pre_ce_data else 0.0
-            nearest_pre_pe_oi = nearest_pre_pe_data['oi'] if nearest_pre_pe_data else 0.0
-            
-        if ce_pe_nearest['PE'] and ce_pe_nearest['CE']:  
-            nearest_ce_data = live_data.get_current_data(ce_pe_nearest['CE']['instrument_token'])
-            nearest_pe_data = live_data.get_current_data(ce_pe_nearest['PE']['instrument_token'])
-            nearest_ce_oi = nearest_ce_data['oi'] if nearest_ce_data else 0.0
-            nearest_pe_oi = nearest_pe_data['oi'] if nearest_pe_data else 0.0
-
-        if ce_pe_next['PE'] and ce_pe_next['CE']:  
-            next_ce_data = live_data.get_current_data(ce_pe_next['CE']['instrument_token'])
-            next_pe_data = live_data.get_current_data(ce_pe_next['PE']['instrument_token'])
-            next_ce_oi = next_ce_data['oi'] if next_ce_data else 0.0
-            next_pe_oi = next_pe_data['oi'] if next_pe_data else 0.0
-
-        if ce_pe_pre_next['PE'] and ce_pe_pre_next['CE']:  
-            next_pre_ce_data = live_data.get_current_data(ce_pe_pre_next['CE']['instrument_token'])
-            next_pre_pe_data = live_data.get_current_data(ce_pe_pre_next['PE']['instrument_token'])
-            next_pre_ce_oi = next_pre_ce_data['oi'] if next_pre_ce_data else 0.0
-            next_pre_pe_oi = next_pre_pe_data['oi'] if next_pre_pe_data else 0.0
-
-        if ce_pe_order['PE'] and ce_pe_order['CE']:  
-            order_ce_data = live_data.get_current_data(ce_pe_order['CE']['instrument_token'])
-            order_pe_data = live_data.get_current_data(ce_pe_order['PE']['instrument_token'])
-            order_ce_oi = order_ce_data['oi'] if order_ce_data else 0.0
-            order_pe_oi = order_pe_data['oi'] if order_pe_data else 0.0
-
-        pcr_pre_nearest = float(nearest_pre_pe_oi) / float(nearest_pre_ce_oi) if float(nearest_pre_ce_oi) != 0 else 0.0
-        pcr_nearest = float(nearest_pe_oi) / float(nearest_ce_oi) if float(nearest_ce_oi) != 0 else 0.0
-        pcr_next = float(next_pe_oi) / float(next_ce_oi) if float(next_ce_oi) != 0 else 0.0
-        pcr_pre_next = float(next_pre_pe_oi) / float(next_pre_ce_oi) if float(next_pre_ce_oi) != 0 else 0.0
-        pcr_order = float(order_pe_oi) / float(order_ce_oi) if float(order_ce_oi) != 0 else 0.0
+        # One vectorized read of the whole chain instead of per-strike lookups
+        option_chain = OptionChainSnapshot.from_selected_tokens(selected_tokens, live_data.store)
+
+        strikes = [nearest_pre_strike, nearest_strike, next_strike, next_pre_strike, order_strike]
+        pe_oi, ce_oi = option_chain.oi(strikes)
+        pcr = option_chain.pcr(strikes).tolist()
+        pe_oi = pe_oi.tolist()
+        ce_oi = ce_oi.tolist()
 
         return {
-            'pcr_pre_nearest': pcr_pre_nearest,
-            'pcr_nearest': pcr_nearest,
-            'pcr_next': pcr_next,
-            'pcr_pre_next': pcr_pre_next,
-            'oi_pre_nearest': [nearest_pre_pe_oi, nearest_pre_ce_oi],
-            'oi_nearest': [nearest_pe_oi, nearest_ce_oi],
-            'oi_next': [next_pe_oi, next_ce_oi],
-            'oi_pre_next': [next_pre_pe_oi, next_pre_ce_oi],
+            'pcr_pre_nearest': pcr[0],
+            'pcr_nearest': pcr[1],
+            'pcr_next': pcr[2],
+            'pcr_pre_next': pcr[3],
+            'oi_pre_nearest': [pe_oi[0], ce_oi[0]],
+            'oi_nearest': [pe_oi[1], ce_oi[1]],
+            'oi_next': [pe_oi[2], ce_oi[2]],
+            'oi_pre_next': [pe_oi[3], ce_oi[3]],
             'strike_range': [nearest_strike, next_strike],
             'pre_strike_range': [nearest_pre_strike, next_pre_strike],
-            'pcr_order': pcr_order
+            'pcr_order': pcr[4]
         }
 
         
-    def analyse_momentum(self, date, parent_token, ce_token, pe_token, unique_key = None):
+    def analyse_momentum(self, date, parent_token, ce_token, pe_token, unique_key = None, min_bars = 6):
         result = {}
         if unique_key is None:
             unique_key = Util.generate_5m_id(date)
@@ -145,23 +142,19 @@ class MomentumAnalyser:
         if current_data_df is None or current_data_df.empty:  # Corrected
             return result
 
-        if len(current_data_df) < 200:
-            return result
-
-        # Fetch DataFrames from stored data
-        
-        parent_df = current_data_df[(current_data_df['token'] == parent_token) & (current_data_df['unique_key'] == unique_key)]
-        premium_ce_df = current_data_df[(current_data_df['token'] == ce_token) & (current_data_df['unique_key'] == unique_key)]
-        premium_pe_df = current_data_df[(current_data_df['token'] == pe_token) & (current_data_df['unique_key'] == unique_key)]
+        # One bar per token from the open up to unique_key
+        parent_df = current_data_df[current_data_df['token'] == parent_token]
+        premium_ce_df = current_data_df[current_data_df['token'] == ce_token]
+        premium_pe_df = current_data_df[current_data_df['token'] == pe_token]
 
-        # Align data based on time (handles different row counts)
-        merged_df = premium_ce_df.merge(premium_pe_df, on="date", suffixes=("_ce", "_pe"), how="inner")
-        merged_df = merged_df.merge(parent_df, on="date", how="inner")
+        # Align the bars of the three tokens (handles missing bars)
+        merged_df = premium_ce_df.merge(premium_pe_df, on="unique_key", suffixes=("_ce", "_pe"), how="inner")
+        merged_df = merged_df.merge(parent_df, on="unique_key", how="inner")
         
         # Drop rows where any required column is NaN
         merged_df = merged_df.dropna().drop_duplicates()
 
-        if len(merged_df) < 50:
+        if len(merged_df) < min_bars:
             return result
             
         # Calculate metrics
@@ -185,48 +178,56 @@ class MomentumAnalyser:
 
         return {"ce_beta": ce_beta, "pe_beta": pe_beta}
 
+    def seed_oi_tracker(self, current_time):
+        # Rebuild today's OI state once, e.g. after a restart in the middle of the session
+        self.oi_tracker.reset(current_time.date())
+        oi_df = self.fetch_oi_records(current_time)
+        if oi_df is None or oi_df.empty:
+            return
+
+        for token, oi in zip(oi_df['token'].to_numpy(), oi_df['oi'].to_numpy()):
+            self.oi_tracker.update(int(token), int(oi))
+
     def calculate_oi_change(self, date, instrument_tokens_data):
         result = {}
 
         tokens = instrument_tokens_data['token_list']
         ce_tokens = instrument_tokens_data['ce_tokens']
         pe_tokens = instrument_tokens_data['pe_tokens']
-        # Fetch CE and PE OI data for the given date
-        oi_df = self.fetch_oi_records(date, tokens)
 
-        if oi_df is None or oi_df.empty:
-            return result
-    
-        # Group by token and compute metrics
-        grouped = oi_df.groupby("token")
         high_ce_oi = high_pe_oi = 0.0
         high_ce_oi_token = high_pe_oi_token = -1
-        for token, group in grouped:
-            filtered_group = group[group["oi"].diff() != 0].reset_index(drop=True)
-
-            token_result = {
-                "oi_change": 0.0,
-                "oi_trend": ""
-            }
-
-            if len(filtered_group) >= 2:
-                oi_trend = self.detect_oi_trend(filtered_group)
-                token_result["oi_change"] = oi_trend['ptc']
-                token_result["oi_trend"] = oi_trend['trend']
-
-            if token in ce_tokens:
-                oi = group["oi"].iloc[-1]
-                if oi > high_ce_oi:
-                    high_ce_oi = oi
-                    high_ce_oi_token = token
-            elif token in pe_tokens:
-                oi = group["oi"].iloc[-1]
-                if oi > high_pe_oi:
-                    high_pe_oi = oi
-                    high_pe_oi_token = token
-
-            result[token] = token_result
+        with self.oi_lock:
+            if self.oi_tracker.day != date.date():
+                self.seed_oi_tracker(date)
 
+            for token in tokens:
+                oi = self.oi_tracker.last_oi(token)
+                if oi is None:
+                    continue
+
+                token_result = {
+                    "oi_change": 0.0,
+                    "oi_trend": ""
+                }
+
+                if self.oi_tracker.change_count(token) >= 2:
+                    oi_trend = self.oi_tracker.detect_oi_trend(token)
+                    token_result["oi_change"] = oi_trend['ptc']
+                    token_result["oi_trend"] = oi_trend['trend']
+
+                if token in ce_tokens:
+                    if oi > high_ce_oi:
+                        high_ce_oi = oi
+                        high_ce_oi_token = token
+                elif token in pe_tokens:
+                    if oi > high_pe_oi:
+                        high_pe_oi = oi
+                        high_pe_oi_token = token
+
+                result[token] = token_result
+
+        if result:
             valid_ce_token = high_ce_oi_token != -1 and high_ce_oi_token in ce_tokens
             valid_pe_token = high_pe_oi_token != -1 and high_pe_oi_token in pe_tokens
             
@@ -292,47 +293,14 @@ class MomentumAnalyser:
         
         return result
 
-    def save_data_to_db(self, df):
-        saved = False
-        table_name = 'tick_details'
-        try:
-            query = """INSERT INTO %s(token, unique_key, date, last_price, oi, volume_traded, bid_volume, offer_volume) VALUES %%s""" % (table_name)
-    
-            # Ensure the database connection is established
-            self.db_conn.connect()
-    
-            # Convert DataFrame to tuples for bulk insert
-            tuples = [tuple(x) for x in df.to_numpy()]
-    
-            # Insert data using a bulk insert method
-            self.db_conn.insert_bulk_data(query, tuples)
-            
-            # Commit transaction
-            self.db_conn.commit()
-            saved = True
-        except Exception as e:
-            self.logging.error(f"Error in saving processed data for {self.token} in processed_details: {e}")
-        finally:
-            if self.db_conn is not None:
-                self.db_conn.close()
-    
-        return saved
-
     def fetch_records(self, parent_token, ce_token, pe_token, unique_key):
         try:
-            # Ensure ce_token and pe_token are lists and format them correctly
-            token_list = [str(parent_token)] + [str(ce_token)] + [str(pe_token)]
-            token_str = ",".join(token_list)  # Convert to comma-separated string
-
-            sql = f"""
-                SELECT token, unique_key, date, last_price, oi, volume_traded, bid_volume, offer_volume  
-                FROM tick_details 
-                WHERE unique_key = {unique_key} AND token IN ({token_str})
-                ORDER BY created_at
-            """
-            
+            token_list = [int(parent_token), int(ce_token), int(pe_token)]
+            # Bars from 09:15 of the same day up to unique_key
+            from_unique_key = unique_key // 10000 * 10000 + 915
+
             self.db_conn.connect()
-            return self.db_conn.get_records_in_data_frame(sql)  # Use self.db_conn instead of db
+            return self.db_conn.fetch_prepared_frame('fetch_records', (token_list, from_unique_key, unique_key))
     
         except Exception as e:
             self.logging.error(f"Error fetching records for momentum calculation: {e}")
@@ -342,24 +310,18 @@ class MomentumAnalyser:
             if self.db_conn is not None:
                 self.db_conn.close()  # Ensure connection is properly closed
 
-    def fetch_oi_records(self, timestamp, tokens):
+    def fetch_oi_records(self, timestamp, tokens = None):
         try:
             time = datetime(timestamp.year, timestamp.month, timestamp.day, 9, 15, 0)
             from_unique_key = Util.generate_5m_id(time)
             to_unique_key = Util.generate_5m_id(timestamp)
 
-            token_str = ','.join([str(item) for item in tokens])
-            
-            sql = f"""
-                SELECT id, token, oi
-                FROM tick_details
-                WHERE token in ({token_str}) and unique_key >= {from_unique_key} AND unique_key <= {to_unique_key}
-                ORDER BY token, id ASC;
-            """
-        
             self.db_conn.connect()
-            
-            return self.db_conn.get_records_in_data_frame(sql)  # Use self.db_conn instead of db
+
+            if tokens:
+                token_list = [int(item) for item in tokens]
+                return self.db_conn.fetch_prepared_frame('fetch_oi_records_tokens', (from_unique_key, to_unique_key, token_list))
+            return self.db_conn.fetch_prepared_frame('fetch_oi_records', (from_unique_key, to_unique_key))
     
         except Exception as e:
             self.logging.error(f"Error fetching records for momentum calculation: {e}")
@@ -371,15 +333,8 @@ class MomentumAnalyser:
 
     def fetch_ticks_data(self, from_dt, to_dt):
         try:
-            sql = f"""
-                SELECT token, date, last_price, oi, volume_traded, bid_volume, offer_volume  
-                FROM tick_details 
-                WHERE date >= '{from_dt}' AND date < '{to_dt}'
-                ORDER BY created_at
-            """
-            
             self.db_conn.connect()
-            ticks_data = self.db_conn.fetch_records(sql)  # Use self.db_conn instead of db
+            ticks_data = self.db_conn.fetch_prepared('fetch_ticks_data', (from_dt, to_dt))
             ticks = []
 
             if len(ticks_data) > 0:     
@@ -1,3 +1,8 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
 
 def moving_average_high_9sma(df):
     return df['high'].rolling(window=9).mean().round(2)
@@ -51,5 +56,282 @@ def calculate_rma(data, period):
     # Fill the first (period-1) values with NaN for alignment
     return [None] * (period - 1) + rma_values
 
-    
-    
\ No newline at end of file
+
+def smooth(values, alpha, start, initial):
+    # y[start] = initial, y[t] = (1 - alpha) * y[t - 1] + alpha * x[t], NaN before start.
+    # Closed form inside fixed-size blocks, a short loop only carries each block's last value.
+    result = np.full(len(values), np.nan)
+    if start >= len(values):
+        return result
+    result[start] = initial
+    x = values[start + 1:]
+    if not len(x):
+        return result
+
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[start + 1:] = x
+        return result
+
+    # Keep decay ** -block well inside float range
+    block = int(max(1, min(256, math.log(1e-8) / math.log(decay)))) if decay < 1.0 else 256
+    blocks = np.concatenate((x, np.zeros(-len(x) % block))).reshape(-1, block)
+    powers = decay ** np.arange(block)
+    partial = np.cumsum(blocks / powers, axis = 1) * (powers * alpha)
+
+    carry = np.empty(len(blocks))
+    previous = initial
+    full_decay = decay ** block
+    for i, end in enumerate(partial[:, -1].tolist()):
+        carry[i] = previous
+        previous = end + full_decay * previous
+
+    partial += np.outer(carry, powers * decay)
+    result[start + 1:] = partial.ravel()[:len(x)]
+    return result
+
+def rma(values, period):
+    # Unrounded calculate_rma as a float64 array, NaN for the first period - 1 values
+    values = np.asarray(values, dtype = float)
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    return smooth(values, 1.0 / period, period - 1, values[:period].mean())
+
+def ema(values, span):
+    # Same as ewm(span = span, adjust = False).mean()
+    values = np.asarray(values, dtype = float)
+    if not len(values):
+        return np.full(0, np.nan)
+    return smooth(values, 2.0 / (span + 1.0), 0, values[0])
+
+def true_range(df):
+    high = df['high'].to_numpy(dtype = float)
+    low = df['low'].to_numpy(dtype = float)
+    close = df['close'].to_numpy(dtype = float)
+    previous_close = np.concatenate(([np.nan], close[:-1]))
+    # fmax skips the missing close of the first bar like DataFrame.max does
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+def average_true_range(df, period = 14):
+    # atr() without the per-step rounding and without adding columns to df
+    return rma(true_range(df), period)
+
+
+class StreamingSMA:
+    """Same values as the rolling().mean().round(2) helpers, one bar at a time.
+
+    Keeps pandas' compensated running sum, so a bar appended with update()
+    gets exactly the value a full recompute over the frame would give.
+    """
+
+    def __init__(self, window, column = 'close'):
+        self.window = window
+        self.column = column
+        self.reset()
+
+    def reset(self):
+        self.values = deque()
+        self.total = 0.0
+        self.add_compensation = 0.0
+        self.remove_compensation = 0.0
+        self.count = 0
+        self.negatives = 0
+        self.same_count = 0
+        self.previous = None
+        self.value = np.nan
+
+    def add(self, value):
+        if value == value:
+            self.count += 1
+            y = value - self.add_compensation
+            t = self.total + y
+            self.add_compensation = t - self.total - y
+            self.total = t
+            if math.copysign(1.0, value) < 0:
+                self.negatives += 1
+            self.same_count = self.same_count + 1 if value == self.previous else 1
+            self.previous = value
+
+    def remove(self, value):
+        if value == value:
+            self.count -= 1
+            y = -value - self.remove_compensation
+            t = self.total + y
+            self.remove_compensation = t - self.total - y
+            self.total = t
+            if math.copysign(1.0, value) < 0:
+                self.negatives -= 1
+
+    def mean(self):
+        if self.count < self.window:
+            return np.nan
+        if self.same_count >= self.count:
+            return self.previous
+        mean = self.total / self.count
+        if self.negatives == 0 and mean < 0:
+            return 0.0
+        if self.negatives == self.count and mean > 0:
+            return 0.0
+        return mean
+
+    def advance(self, value):
+        self.values.append(value)
+        if len(self.values) > self.window:
+            self.remove(self.values.popleft())
+        if self.window == 1:
+            self.reset_window(value)
+        else:
+            self.add(value)
+
+    def reset_window(self, value):
+        # pandas restarts the sum when consecutive windows don't overlap
+        self.total = self.add_compensation = self.remove_compensation = 0.0
+        self.count = self.negatives = self.same_count = 0
+        self.previous = value
+        self.add(value)
+
+    def push(self, value):
+        self.advance(float(value))
+        self.value = np.round(self.mean(), 2)
+        return self.value
+
+    def seed_values(self, values):
+        values = np.asarray(values, dtype = float)
+        self.reset()
+        # The column in one vectorized pass, the running state replayed to match it
+        result = pd.Series(values).rolling(window = self.window).mean().round(2).to_numpy()
+        for value in values.tolist():
+            self.advance(value)
+        if len(result):
+            self.value = result[-1]
+        return result
+
+    def seed(self, df):
+        return pd.Series(self.seed_values(df[self.column].to_numpy(dtype = float)), index = df.index)
+
+    def update(self, bar):
+        return self.push(bar[self.column])
+
+
+class StreamingRMA:
+    """Wilder's moving average one value at a time.
+
+    With the default decimals = 2 it rounds every step like calculate_rma,
+    with decimals = None it follows the unrounded rma() instead.
+    """
+
+    def __init__(self, period, column = 'close', decimals = 2):
+        self.period = period
+        self.column = column
+        self.decimals = decimals
+        self.reset()
+
+    def reset(self):
+        self.first = []
+        self.value = np.nan
+
+    def round(self, value):
+        value = np.float64(value)
+        return value if self.decimals is None else value.round(self.decimals)
+
+    def push(self, value):
+        if len(self.first) < self.period:
+            # First RMA value is the SMA of the first 'period' values
+            self.first.append(value)
+            if len(self.first) == self.period:
+                self.value = self.round(pd.Series(self.first).mean())
+            return self.value
+        self.value = self.round(((self.value * (self.period - 1)) + value) / self.period)
+        return self.value
+
+    def seed_values(self, values):
+        values = np.asarray(values, dtype = float)
+        self.reset()
+        if self.decimals is None:
+            # Unrounded, the state is just the last value
+            result = rma(values, self.period)
+            self.first = values[:self.period].tolist()
+            if len(result):
+                self.value = result[-1]
+            return result
+        # Every step rounds the previous value, so the recursion can't be collapsed
+        return np.array([self.push(value) for value in values], dtype = float)
+
+    def seed(self, df):
+        return pd.Series(self.seed_values(df[self.column].to_numpy(dtype = float)), index = df.index)
+
+    def update(self, bar):
+        return self.push(bar[self.column])
+
+
+class StreamingEMA:
+    """ewm(span, adjust = False).mean().round(2), one value at a time."""
+
+    def __init__(self, span, column = 'close'):
+        self.span = span
+        self.column = column
+        self.alpha = 2.0 / (span + 1.0)
+        self.reset()
+
+    def reset(self):
+        self.weighted = np.nan
+        self.value = np.nan
+
+    def push(self, value):
+        value = float(value)
+        if self.weighted != self.weighted:
+            self.weighted = value
+        elif value == value and self.weighted != value:
+            old_weight = 1.0 - self.alpha
+            self.weighted = (old_weight * self.weighted + self.alpha * value) / (old_weight + self.alpha)
+        self.value = np.round(self.weighted, 2)
+        return self.value
+
+    def seed_values(self, values):
+        values = np.asarray(values, dtype = float)
+        self.reset()
+        result = pd.Series(values).ewm(span = self.span, adjust = False).mean()
+        valid = result.dropna()
+        if not valid.empty:
+            self.weighted = valid.iloc[-1]
+            self.value = np.round(self.weighted, 2)
+        return result.round(2).to_numpy()
+
+    def seed(self, df):
+        return pd.Series(self.seed_values(df[self.column].to_numpy(dtype = float)), index = df.index)
+
+    def update(self, bar):
+        return self.push(bar[self.column])
+
+
+class StreamingATR:
+    """Same values as atr(), updated from each new bar without touching the frame."""
+
+    def __init__(self, period = 14):
+        self.period = period
+        self.rma = StreamingRMA(period)
+        self.previous_close = np.nan
+
+    @property
+    def value(self):
+        return self.rma.value
+
+    def true_range(self, high, low, close):
+        ranges = [high - low, abs(high - self.previous_close), abs(low - self.previous_close)]
+        ranges = [value for value in ranges if value == value]
+        self.previous_close = close
+        return max(ranges) if ranges else np.nan
+
+    def seed(self, df):
+        high = df['high'].to_numpy(dtype = float)
+        low = df['low'].to_numpy(dtype = float)
+        close = df['close'].to_numpy(dtype = float)
+        previous_close = np.concatenate(([np.nan], close[:-1]))
+        tr = pd.DataFrame({'high_low': high - low, 'high_close': np.abs(high - previous_close),
+                           'low_close': np.abs(low - previous_close)}).max(axis = 1).to_numpy()
+        self.previous_close = close[-1] if len(close) else np.nan
+        return pd.Series(self.rma.seed_values(tr), index = df.index)
+
+    def update(self, bar):
+        tr = self.true_range(float(bar['high']), float(bar['low']), float(bar['close']))
+        return self.rma.push(tr)
@@ -0,0 +1,128 @@
+import time
+import traceback
+from psycopg2 import sql
+
+from db_connect import PostgresDB
+
+class OiAggregateStore:
+    """Continuous 5-minute OI/price bars kept next to tick_details.
+
+    tick_oi_5m holds one row per (token, unique_key) with the first, last,
+    min and max OI and price of the bar. TickWriter merges every flushed
+    batch into it, so readers scan ~75 rows per token per day instead of
+    every tick.
+    """
+
+    table_name = 'tick_oi_5m'
+    columns = ['token', 'unique_key', 'date', 'first_at', 'last_at',
+               'first_oi', 'last_oi', 'min_oi', 'max_oi',
+               'first_price', 'last_price', 'min_price', 'max_price',
+               'volume_traded', 'tick_count']
+
+    # A bar spans several batches and replayed ticks can arrive late,
+    # so first/last are resolved by timestamp rather than arrival order
+    merge_query = """
+        INSERT INTO tick_oi_5m AS bar (token, unique_key, date, first_at, last_at,
+                                       first_oi, last_oi, min_oi, max_oi,
+                                       first_price, last_price, min_price, max_price,
+                                       volume_traded, tick_count)
+        VALUES %s
+        ON CONFLICT (token, unique_key) DO UPDATE SET
+            first_at = LEAST(bar.first_at, EXCLUDED.first_at),
+            first_oi = CASE WHEN EXCLUDED.first_at < bar.first_at THEN EXCLUDED.first_oi ELSE bar.first_oi END,
+            first_price = CASE WHEN EXCLUDED.first_at < bar.first_at THEN EXCLUDED.first_price ELSE bar.first_price END,
+            last_at = GREATEST(bar.last_at, EXCLUDED.last_at),
+            last_oi = CASE WHEN EXCLUDED.last_at >= bar.last_at THEN EXCLUDED.last_oi ELSE bar.last_oi END,
+            last_price = CASE WHEN EXCLUDED.last_at >= bar.last_at THEN EXCLUDED.last_price ELSE bar.last_price END,
+            min_oi = LEAST(bar.min_oi, EXCLUDED.min_oi),
+            max_oi = GREATEST(bar.max_oi, EXCLUDED.max_oi),
+            min_price = LEAST(bar.min_price, EXCLUDED.min_price),
+            max_price = GREATEST(bar.max_price, EXCLUDED.max_price),
+            volume_traded = GREATEST(bar.volume_traded, EXCLUDED.volume_traded),
+            tick_count = bar.tick_count + EXCLUDED.tick_count
+    """
+
+    def __init__(self, setting, logging):
+        self.setting = setting
+        self.logging = logging
+        self.db_conn = PostgresDB(setting, logging)
+
+    def aggregate(self, rows):
+        """Fold tick tuples (TickWriter.columns order) into one bar tuple per (token, unique_key)."""
+        bars = {}
+        for token, unique_key, date, last_price, oi, volume_traded, _, _ in rows:
+            key = (token, unique_key)
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = [token, unique_key, date.replace(minute = date.minute // 5 * 5, second = 0, microsecond = 0),
+                             date, date, oi, oi, oi, oi, last_price, last_price, last_price, last_price, volume_traded, 1]
+                continue
+
+            if date < bar[3]:
+                bar[3], bar[5], bar[9] = date, oi, last_price
+            if date >= bar[4]:
+                bar[4], bar[6], bar[10] = date, oi, last_price
+            bar[7] = min(bar[7], oi)
+            bar[8] = max(bar[8], oi)
+            bar[11] = min(bar[11], last_price)
+            bar[12] = max(bar[12], last_price)
+            bar[13] = max(bar[13], volume_traded)
+            bar[14] += 1
+
+        return [tuple(bar) for bar in bars.values()]
+
+    def merge(self, db_conn, rows):
+        """Merge a batch of ticks into the bars on `db_conn`'s open transaction."""
+        bars = self.aggregate(rows)
+        if not bars:
+            return True
+        return db_conn.insert_bulk_data(self.merge_query, bars)
+
+    def rebuild(self, from_dt = None, to_dt = None, source = 'tick_details'):
+        """Recompute bars for a date range straight from `source`, e.g. after a backfill."""
+        started_at = time.monotonic()
+        conditions = [sql.SQL("oi IS NOT NULL")]
+        params = []
+        if from_dt is not None:
+            conditions.append(sql.SQL("date >= %s"))
+            params.append(from_dt)
+        if to_dt is not None:
+            conditions.append(sql.SQL("date <= %s"))
+            params.append(to_dt)
+        where = sql.SQL(' AND ').join(conditions)
+
+        try:
+            self.db_conn.connect()
+            self.db_conn.cur.execute(sql.SQL("""
+                DELETE FROM tick_oi_5m bar
+                USING (SELECT DISTINCT token, unique_key FROM {source} WHERE {where}) tick
+                WHERE bar.token = tick.token AND bar.unique_key = tick.unique_key
+            """).format(source = sql.Identifier(source), where = where), params)
+
+            self.db_conn.cur.execute(sql.SQL("""
+                INSERT INTO tick_oi_5m ({columns})
+                SELECT token, unique_key,
+                       date_trunc('hour', min(date)) + floor(date_part('minute', min(date)) / 5) * INTERVAL '5 minutes',
+                       min(date), max(date),
+                       (array_agg(oi ORDER BY date, id))[1], (array_agg(oi ORDER BY date DESC, id DESC))[1],
+                       min(oi), max(oi),
+                       (array_agg(last_price ORDER BY date, id))[1], (array_agg(last_price ORDER BY date DESC, id DESC))[1],
+                       min(last_price), max(last_price),
+                       max(volume_traded), count(*)
+                FROM {source}
+                WHERE {where}
+                GROUP BY token, unique_key
+            """).format(columns = sql.SQL(', ').join(map(sql.Identifier, self.columns)),
+                        source = sql.Identifier(source), where = where), params)
+            rebuilt = self.db_conn.cur.rowcount
+            self.db_conn.commit()
+
+            self.logging.info(f"Rebuilt {rebuilt} rows of {self.table_name} from {source} in {time.monotonic() - started_at:.2f}s")
+            return rebuilt
+        except Exception as e:
+            self.logging.error(f"Error rebuilding {self.table_name}: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+
+        return None
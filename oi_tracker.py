@@ -0,0 +1,80 @@
+from collections import deque
+
+class TokenOiState:
+    __slots__ = ('last_oi', 'count', 'window', 'total', 'sma', 'prev_sma', 'series')
+
+    def __init__(self, window, series_size):
+        self.last_oi = None
+        self.count = 0
+        self.window = deque(maxlen = window)
+        self.total = 0.0
+        self.sma = None
+        self.prev_sma = None
+        self.series = deque(maxlen = series_size)
+
+class OiTrendTracker:
+    """Per-token OI change series with a running SMA, fed tick by tick.
+
+    Mirrors `MomentumAnalyser.detect_oi_trend` over the de-duplicated OI rows
+    of the day (rolling mean with min_periods=1, then pct_change of the SMA),
+    without re-reading tick_details.
+    """
+
+    def __init__(self, window = 7, series_size = 5000):
+        self.window = window
+        self.series_size = series_size
+        self.day = None
+        self.states = {}
+
+    def reset(self, day):
+        self.day = day
+        self.states = {}
+
+    def update(self, token, oi):
+        state = self.states.get(token)
+        if state is None:
+            state = self.states[token] = TokenOiState(self.window, self.series_size)
+
+        if oi == state.last_oi:
+            return False
+
+        if len(state.window) == self.window:
+            state.total -= state.window[0]
+        state.window.append(oi)
+        state.total += oi
+
+        state.last_oi = oi
+        state.count += 1
+        state.prev_sma = state.sma
+        state.sma = state.total / len(state.window)
+        state.series.append(oi)
+        return True
+
+    def last_oi(self, token):
+        state = self.states.get(token)
+        return state.last_oi if state is not None else None
+
+    def change_count(self, token):
+        state = self.states.get(token)
+        return state.count if state is not None else 0
+
+    def detect_oi_trend(self, token):
+        result = {'trend': 'Unknown', 'ptc': 0.0}
+        state = self.states.get(token)
+        if state is None or state.count < 2:
+            return result
+
+        if state.prev_sma == 0:
+            delta = float('inf') if state.sma > 0 else float('nan')
+        else:
+            delta = (state.sma / state.prev_sma - 1) * 100
+
+        if delta > 0.4:
+            result['trend'] = 'Increasing'
+        elif delta < -0.4:
+            result['trend'] = 'Decreasing'
+        else:
+            result['trend'] = 'Stable'
+
+        result['ptc'] = delta
+        return result
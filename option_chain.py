@@ -0,0 +1,71 @@
+import numpy as np
+
+class OptionChainSnapshot:
+    """Strike-sorted CE/PE arrays read from the live store in one pass."""
+
+    def __init__(self, strikes, ce_tokens, pe_tokens, store):
+        self.strikes = strikes
+        self.ce_tokens = ce_tokens
+        self.pe_tokens = pe_tokens
+
+        ce_slots = store.slots_for(ce_tokens)
+        pe_slots = store.slots_for(pe_tokens)
+        # A strike only counts when both legs are listed, as in the old per-strike checks
+        listed = (ce_tokens >= 0) & (pe_tokens >= 0)
+
+        self.ce_oi = np.where(listed, store.read('oi', ce_slots), 0)
+        self.pe_oi = np.where(listed, store.read('oi', pe_slots), 0)
+        self.ce_price = np.where(listed, store.read('price', ce_slots, np.nan), np.nan)
+        self.pe_price = np.where(listed, store.read('price', pe_slots, np.nan), np.nan)
+        self.ce_volume = np.where(listed, store.read('volume_traded', ce_slots), 0)
+        self.pe_volume = np.where(listed, store.read('volume_traded', pe_slots), 0)
+
+    @classmethod
+    def from_selected_tokens(cls, selected_tokens, store):
+        strikes = np.array(sorted(set(selected_tokens.get('strikes', []))), dtype = np.int64)
+        ce_tokens = np.full(len(strikes), -1, dtype = np.int64)
+        pe_tokens = np.full(len(strikes), -1, dtype = np.int64)
+
+        for i, strike in enumerate(strikes.tolist()):
+            legs = selected_tokens.get(strike) or {}
+            if legs.get('CE'):
+                ce_tokens[i] = legs['CE']['instrument_token']
+            if legs.get('PE'):
+                pe_tokens[i] = legs['PE']['instrument_token']
+
+        return cls(strikes, ce_tokens, pe_tokens, store)
+
+    def positions(self, strikes):
+        """Index of each strike in the chain, -1 when the strike is not in it."""
+        strikes = np.asarray([-1 if strike is None else strike for strike in strikes], dtype = np.int64)
+        if len(self.strikes) == 0:
+            return np.full(len(strikes), -1, dtype = np.int64)
+
+        index = np.minimum(np.searchsorted(self.strikes, strikes), len(self.strikes) - 1)
+        return np.where(self.strikes[index] == strikes, index, -1)
+
+    def take(self, values, positions, fill = 0):
+        if len(values) == 0:
+            return np.full(len(positions), fill)
+        return np.where(positions >= 0, values[np.maximum(positions, 0)], fill)
+
+    def oi(self, strikes):
+        """(pe_oi, ce_oi) arrays for the given strikes."""
+        positions = self.positions(strikes)
+        return self.take(self.pe_oi, positions), self.take(self.ce_oi, positions)
+
+    def pcr(self, strikes = None):
+        pe_oi, ce_oi = self.oi(strikes) if strikes is not None else (self.pe_oi, self.ce_oi)
+        pe_oi = pe_oi.astype(np.float64)
+        ce_oi = ce_oi.astype(np.float64)
+        return np.divide(pe_oi, ce_oi, out = np.zeros_like(pe_oi), where = ce_oi != 0)
+
+    def oi_sum(self, strikes = None):
+        pe_oi, ce_oi = self.oi(strikes) if strikes is not None else (self.pe_oi, self.ce_oi)
+        return int(pe_oi.sum()), int(ce_oi.sum())
+
+    def high_oi_strikes(self):
+        """Strikes holding the highest CE and PE open interest, -1 when the chain has no OI."""
+        high_ce = int(self.strikes[np.argmax(self.ce_oi)]) if len(self.strikes) and self.ce_oi.max() > 0 else -1
+        high_pe = int(self.strikes[np.argmax(self.pe_oi)]) if len(self.strikes) and self.pe_oi.max() > 0 else -1
+        return high_ce, high_pe
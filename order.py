@@ -1,7 +1,7 @@
 import re
 
 from datetime import datetime, timedelta
-from common import Util
+from historical_cache import HistoricalCache
 import pandas as pd
 import traceback
 
@@ -21,7 +21,6 @@ class MarketOrder:
         self.logging = logging
         self.trail_at = None
         self.close_position = None
-        self.current_candle = {}
         self.trailed = False
         self.scalping = False
 
@@ -201,7 +200,7 @@ class MarketOrder:
             from_dt = to_dt - timedelta(minutes=15)
     
             try:
-                historical_data = kite_login.conn.historical_data(self.token, from_dt, to_dt, "5minute")
+                historical_data = HistoricalCache.shared(self.logging).fetch(kite_login, self.token, from_dt, to_dt, "5minute")
                 if historical_data:
                     self.candle = historical_data[-1]
                     
@@ -420,21 +419,21 @@ class MarketOrder:
     
         return False
 
-    def should_trail_order(self, kite_login):
+    def should_trail_order(self, kite_login, candle_builder = None):
         if self.trailed:
             return False
             
         if self.sl_order_id is not None and self.sl_price is not None:
             if self.order_placed_at is not None and self.exceed_time():
                 if self.trail_at is None or datetime.now() > self.trail_at + timedelta(minutes = 5):
-                    order_data = self.get_token_data(kite_login)
+                    order_data = self.get_token_data(kite_login, candle_builder)
                     if order_data is not None and len(order_data) >= 2:
                         if order_data.iloc[-1]['low'] > self.candle['high'] + 5 and self.candle['high'] - self.sl_price > 5:
                             return True
         
         return False
 
-    def get_token_data(self, kite_login):
+    def get_token_data(self, kite_login, candle_builder = None):
         try:
             current_time = datetime.now()
             # current_time = datetime(current_time.year, 2, 28, 14, 15)
@@ -446,17 +445,12 @@ class MarketOrder:
             to_dt = from_dt + timedelta(minutes = candle_count * 5)
             from_dt = to_dt - timedelta(minutes = 15)
 
-            unique_key = Util.generate_5m_id(current_time - timedelta(minutes = 5))
-            
-            if unique_key in self.current_candle:
-                return self.current_candle[unique_key]
-            
-            data = kite_login.conn.historical_data(self.token, from_dt, to_dt, "5minute")
-            data_df = pd.DataFrame(data)
+            if candle_builder is not None:
+                data = candle_builder.fetch_candles(kite_login, self.token, from_dt, to_dt)
+            else:
+                data = HistoricalCache.shared(self.logging).fetch(kite_login, self.token, from_dt, to_dt, "5minute")
 
-            self.current_candle[unique_key] = data_df
-            
-            return data_df
+            return pd.DataFrame(data)
                
         except Exception as e:
             self.logging.error(f"Error in refreshing 5m data for {self.token}: {e}")
@@ -100,7 +100,7 @@ class OrderHandler:
                         order.cancel_sl_order(self.kite_login)
                     elif order.is_trend_discontinues(self.kite_login, instrument, live_data):
                         order.cancel_sl_order(self.kite_login)
-                    elif order.should_trail_order(self.kite_login):
+                    elif order.should_trail_order(self.kite_login, live_data.candle_builder):
                         order.trail_stop_loss_order(self.kite_login)
                     # elif order.should_modify_sl_order(live_data):
                     #     order.update_stop_loss_order(self.kite_login, live_data)
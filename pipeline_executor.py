@@ -0,0 +1,87 @@
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+class PipelineExecutor:
+    """Runs one pipeline per underlying on a thread pool.
+
+    Each instrument is isolated: an exception is logged against its token and
+    does not stop the others. `run` waits at most `deadline` seconds; anything
+    still running is reported as a straggler and is not resubmitted until it
+    finishes, so a slow instrument never runs twice at once.
+    """
+
+    def __init__(self, setting, logging, max_workers = None, deadline = None):
+        self.setting = setting
+        self.logging = logging
+        self.max_workers = max_workers or setting.pipeline_workers
+        self.deadline = deadline or setting.pipeline_deadline
+        self.executor = ThreadPoolExecutor(max_workers = self.max_workers, thread_name_prefix = 'pipeline')
+        self.in_flight = {}
+        self.stats = {'runs': 0, 'completed': 0, 'failed': 0, 'stragglers': 0, 'skipped': 0, 'durations': {}}
+
+    def run(self, instruments, pipeline):
+        """Call `pipeline(token, instrument)` for every instrument, bounded by the deadline."""
+        started_at = time.monotonic()
+        futures = {}
+
+        for token, instrument in list(instruments.items()):
+            running = self.in_flight.get(token)
+            if running is not None and not running.done():
+                self.stats['skipped'] += 1
+                self.logging.warning(f"Pipeline for {token} still running from a previous iteration, skipped")
+                continue
+
+            future = self.executor.submit(self.timed, pipeline, token, instrument)
+            self.in_flight[token] = future
+            futures[future] = token
+
+        self.stats['runs'] += 1
+        if not futures:
+            return []
+
+        done, not_done = wait(futures, timeout = self.deadline)
+
+        for future in done:
+            self.collect(futures[future], future)
+
+        stragglers = [futures[future] for future in not_done]
+        for future in not_done:
+            future.add_done_callback(lambda finished, token = futures[future]: self.collect(token, finished))
+
+        if stragglers:
+            self.stats['stragglers'] += len(stragglers)
+            elapsed = time.monotonic() - started_at
+            self.logging.warning(f"Pipeline deadline {self.deadline}s missed after {elapsed:.2f}s by: {stragglers}")
+
+        return stragglers
+
+    def timed(self, pipeline, token, instrument):
+        started_at = time.monotonic()
+        try:
+            return pipeline(token, instrument)
+        finally:
+            self.stats['durations'][token] = round(time.monotonic() - started_at, 3)
+
+    def collect(self, token, future):
+        error = future.exception()
+        if error is None:
+            self.stats['completed'] += 1
+            return
+
+        self.stats['failed'] += 1
+        self.logging.error(f"Pipeline failed for {token}: {error}")
+        self.logging.error(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
+
+    def running(self):
+        """Tokens whose pipeline is still executing, e.g. a straggler past the deadline."""
+        return {token for token, future in list(self.in_flight.items()) if not future.done()}
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['durations'] = dict(self.stats['durations'])
+        stats['in_flight'] = sorted(self.running())
+        return stats
+
+    def shutdown(self, wait = False):
+        self.executor.shutdown(wait = wait, cancel_futures = True)
@@ -0,0 +1,45 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` calls per second with bursts of `capacity`."""
+
+    def __init__(self, rate, capacity = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {
+            'acquired': 0,
+            'timeouts': 0,
+            'waited_seconds': 0.0
+        }
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout = None):
+        """Block until a call is allowed; False if that would take longer than `timeout`."""
+        started_at = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.stats['acquired'] += 1
+                    self.stats['waited_seconds'] += now - started_at
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if timeout is not None and now - started_at + wait > timeout:
+                with self.lock:
+                    self.stats['timeouts'] += 1
+                return False
+            time.sleep(wait)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
@@ -27,6 +27,26 @@ class Setting:
             self.db_port        = self.settings.get("db_port")
             self.table_name_5m  = self.settings.get("table_name_5m")
             self.table_name_30m = self.settings.get("table_name_30m")
+            self.pipeline_workers = self.settings.get("pipeline_workers", 4)
+            self.pipeline_deadline = self.settings.get("pipeline_deadline", 3.0)
+            self.db_pool_min    = self.settings.get("db_pool_min", 1)
+            self.db_pool_max    = self.settings.get("db_pool_max", 10)
+            self.db_pool_health_check = self.settings.get("db_pool_health_check", 30)
+            self.tick_retention_days = self.settings.get("tick_retention_days", 30)
+            self.tick_copy_retention_days = self.settings.get("tick_copy_retention_days")
+            self.tick_retention_drop = self.settings.get("tick_retention_drop", True)
+            # Kite allows 3 historical_data requests per second
+            self.historical_rate_limit = self.settings.get("historical_rate_limit", 3)
+            self.historical_workers = self.settings.get("historical_workers", 4)
+            self.historical_retries = self.settings.get("historical_retries", 3)
+            self.historical_max_pages = self.settings.get("historical_max_pages", 10)
+            # Incremental sync keeps the candle tables and fetches only the missing days
+            self.historical_incremental = self.settings.get("historical_incremental", True)
+            self.historical_retention_days = self.settings.get("historical_retention_days", 30)
+            self.historical_derive_30m = self.settings.get("historical_derive_30m", True)
+            self.market_holidays = {datetime.strptime(day, '%Y-%m-%d').date() for day in self.settings.get("market_holidays", [])}
+            # Local Arrow copy of the candle tables, None disables it
+            self.candle_archive_dir = self.settings.get("candle_archive_dir", "data/candles")
             
         self.last_loaded_at = datetime.now()
         return self
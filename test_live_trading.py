@@ -202,7 +202,7 @@ while True:
                     order_handler.manage_orders(instruments, live_data)
                     
             for token in instruments.keys():
-                instruments[token].refresh_data(kite_login, current_time)
+                instruments[token].refresh_data(kite_login, current_time, live_data)
                 instruments[token].load_momentum_analysis(kite_login, live_data, instrument_token, current_time)
                 instruments[token].load_current_data_analysis(live_data, instrument_token, current_time)
                 instruments[token].print_analysis_details(True)
@@ -0,0 +1,95 @@
+class TickRingBuffer:
+    """Preallocated single-producer/single-consumer ring buffer for ticks.
+
+    The KiteTicker thread is the only writer of `tail` and the main loop the
+    only writer of `head`, so the hand-off needs no lock under the GIL.
+    """
+
+    def __init__(self, capacity = 65536):
+        # Round up to a power of two so slot lookup is a mask, not a modulo
+        size = 1
+        while size < capacity:
+            size <<= 1
+
+        self.capacity = size
+        self.mask = size - 1
+        self.slots = [None] * size
+        self.head = 0
+        self.tail = 0
+        self.pushed = 0
+        self.overflowed = 0
+        self.drained = 0
+        self.high_watermark = 0
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def push(self, tick):
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            self.overflowed += 1
+            return False
+
+        self.slots[tail & self.mask] = tick
+        # Publish only after the slot is written
+        self.tail = tail + 1
+        self.pushed += 1
+        return True
+
+    def push_many(self, ticks):
+        slots = self.slots
+        mask = self.mask
+        tail = self.tail
+        limit = self.head + self.capacity
+        accepted = 0
+
+        for tick in ticks:
+            if tail >= limit:
+                break
+            slots[tail & mask] = tick
+            tail += 1
+            accepted += 1
+
+        self.tail = tail
+        self.pushed += accepted
+        self.overflowed += len(ticks) - accepted
+
+        depth = tail - self.head
+        if depth > self.high_watermark:
+            self.high_watermark = depth
+        return accepted
+
+    def drain(self):
+        """Yield the ticks present when draining starts, releasing each slot in place."""
+        slots = self.slots
+        mask = self.mask
+        head = self.head
+        tail = self.tail
+
+        while head < tail:
+            index = head & mask
+            tick = slots[index]
+            slots[index] = None
+            head += 1
+            self.head = head
+            self.drained += 1
+            yield tick
+
+    def discard(self):
+        tail = self.tail
+        count = tail - self.head
+        for position in range(self.head, tail):
+            self.slots[position & self.mask] = None
+        self.head = tail
+        self.drained += count
+        return count
+
+    def get_stats(self):
+        return {
+            'capacity': self.capacity,
+            'depth': len(self),
+            'pushed': self.pushed,
+            'drained': self.drained,
+            'overflowed': self.overflowed,
+            'high_watermark': self.high_watermark
+        }
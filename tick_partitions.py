@@ -0,0 +1,152 @@
+import re
+import traceback
+from datetime import datetime, timedelta
+
+from db_connect import PostgresDB
+
+class TickPartitionManager:
+    """Keeps tick_details and tick_details_copy range-partitioned by trading day.
+
+    Each day lives in its own `<table>_YYYYMMDD` partition, so retention is
+    a DETACH (and optionally DROP) of whole partitions instead of TRUNCATE
+    or DELETE, and date-bounded queries only touch the partitions they need.
+    """
+
+    tables = ['tick_details', 'tick_details_copy']
+
+    def __init__(self, setting, logging):
+        self.setting = setting
+        self.logging = logging
+        self.db_conn = PostgresDB(setting, logging)
+        # None keeps every partition, tick_details_copy is the training archive
+        self.retention_days = {
+            'tick_details': setting.tick_retention_days,
+            'tick_details_copy': setting.tick_copy_retention_days
+        }
+
+    def partition_name(self, table, day):
+        return f"{table}_{day:%Y%m%d}"
+
+    def next_trading_day(self, day):
+        day = day + timedelta(days = 1)
+        while day.weekday() >= 5:
+            day = day + timedelta(days = 1)
+        return day
+
+    def create_partition(self, table, day):
+        start = datetime(day.year, day.month, day.day)
+        end = start + timedelta(days = 1)
+        self.db_conn.cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.partition_name(table, day)} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+
+    def ensure_partitions(self, day = None):
+        """Create today's and the next trading day's partitions for every table."""
+        day = (day or datetime.now()).date()
+        try:
+            self.db_conn.connect()
+            for table in self.tables:
+                if not self.is_partitioned(table):
+                    self.logging.warning(f"{table} is not partitioned, run migrate_to_partitioned first")
+                    continue
+                for partition_day in [day, self.next_trading_day(day)]:
+                    self.create_partition(table, partition_day)
+            self.db_conn.commit()
+            return True
+        except Exception as e:
+            self.logging.error(f"Error creating tick partitions: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+        return False
+
+    def is_partitioned(self, table):
+        self.db_conn.cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+        row = self.db_conn.cur.fetchone()
+        return row is not None and row[0] == 'p'
+
+    def list_partitions(self, table):
+        """(day, partition) pairs attached to `table`, oldest first."""
+        self.db_conn.cur.execute("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+        """, (table,))
+
+        partitions = []
+        for (name,) in self.db_conn.cur.fetchall():
+            match = re.fullmatch(rf"{table}_(\d{{8}})", name)
+            if match:
+                partitions.append((datetime.strptime(match.group(1), '%Y%m%d').date(), name))
+        return sorted(partitions)
+
+    def apply_retention(self, day = None):
+        """Detach partitions older than the retention window, dropping them unless configured to keep."""
+        day = (day or datetime.now()).date()
+        removed = []
+        try:
+            self.db_conn.connect()
+            for table in self.tables:
+                retention_days = self.retention_days.get(table)
+                if retention_days is None or not self.is_partitioned(table):
+                    continue
+
+                cutoff = day - timedelta(days = retention_days)
+                for partition_day, name in self.list_partitions(table):
+                    if partition_day >= cutoff:
+                        break
+                    self.db_conn.cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    if self.setting.tick_retention_drop:
+                        self.db_conn.cur.execute(f"DROP TABLE {name}")
+                    removed.append(name)
+
+            self.db_conn.commit()
+            if removed:
+                action = 'Dropped' if self.setting.tick_retention_drop else 'Detached'
+                self.logging.info(f"{action} tick partitions: {removed}")
+            return removed
+        except Exception as e:
+            self.logging.error(f"Error applying tick partition retention: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+        return None
+
+    def maintain(self, day = None):
+        if not self.ensure_partitions(day):
+            return False
+        return self.apply_retention(day) is not None
+
+    def migrate_to_partitioned(self, table, create_query):
+        """Move an existing plain `table` into a partitioned one, keeping every row."""
+        try:
+            self.db_conn.connect()
+            if self.is_partitioned(table):
+                return True
+
+            legacy = f"{table}_legacy"
+            self.db_conn.cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+            # Index names are global, free them for the new table
+            for suffix in ['pkey', 'token_date_key', 'token_date']:
+                self.db_conn.cur.execute(f"ALTER INDEX IF EXISTS {table}_{suffix} RENAME TO {legacy}_{suffix}")
+            self.db_conn.cur.execute(create_query)
+
+            self.db_conn.cur.execute(f"SELECT DISTINCT date::date FROM {legacy} ORDER BY 1")
+            days = [row[0] for row in self.db_conn.cur.fetchall()]
+            for day in days:
+                self.create_partition(table, day)
+
+            columns = 'token, unique_key, date, last_price, oi, volume_traded, bid_volume, offer_volume, created_at'
+            self.db_conn.cur.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy} ORDER BY id")
+            self.db_conn.cur.execute(f"DROP TABLE {legacy}")
+            self.db_conn.commit()
+
+            self.logging.info(f"Migrated {table} to {len(days)} daily partitions")
+            return True
+        except Exception as e:
+            self.logging.error(f"Error migrating {table} to partitions: {e}")
+            self.logging.error(traceback.format_exc())
+        finally:
+            self.db_conn.close()
+        return False
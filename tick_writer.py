@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+
+from db_connect import PostgresDB
+from oi_aggregates import OiAggregateStore
+
+class TickWriter:
+    """Background writer that batches tick rows into tick_details."""
+
+    columns = ['token', 'unique_key', 'date', 'last_price', 'oi', 'volume_traded', 'bid_volume', 'offer_volume']
+
+    def __init__(self, setting, logging, batch_size = 2000, flush_interval = 2.0, max_queue_size = 100000):
+        self.logging = logging
+        self.db_conn = PostgresDB(setting, logging)
+        self.oi_aggregates = OiAggregateStore(setting, logging)
+        self.table_name = 'tick_details'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize = max_queue_size)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+            'batches': 0,
+            'max_queue_depth': 0,
+            'last_flush_rows': 0,
+            'last_flush_seconds': 0.0
+        }
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target = self.run, name = 'tick-writer', daemon = True)
+            self.thread.start()
+
+    def put(self, row):
+        """Queue one tick tuple (in `columns` order); never blocks the caller."""
+        if self.thread is None:
+            self.start()
+
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+
+        self.stats['enqueued'] += 1
+        depth = self.queue.qsize()
+        if depth > self.stats['max_queue_depth']:
+            self.stats['max_queue_depth'] = depth
+        return True
+
+    def run(self):
+        batch = []
+        last_flush = time.monotonic()
+
+        while not self.stop_event.is_set():
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.05)
+            try:
+                batch.append(self.queue.get(timeout = timeout))
+                # Pull whatever else is already waiting without blocking
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or (batch and time.monotonic() - last_flush >= self.flush_interval):
+                self.flush(batch)
+                batch = []
+                last_flush = time.monotonic()
+
+        # Drain anything left behind after stop() was requested
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+
+        if batch:
+            self.flush(batch)
+
+    def flush(self, rows):
+        started_at = time.monotonic()
+        saved = False
+        try:
+            self.db_conn.connect()
+            # A batch can hold several ticks for a token within the same second
+            inserted = self.db_conn.copy_rows(self.table_name, self.columns, rows, conflict_columns = ['token', 'date'],
+                                              returning = self.columns)
+            # The 5-minute OI bars commit together with the ticks they summarise,
+            # built from the inserted rows so dropped duplicates aren't counted twice
+            if inserted is not False and self.oi_aggregates.merge(self.db_conn, inserted):
+                self.db_conn.commit()
+                saved = True
+        except Exception as e:
+            self.logging.error(f"Error in flushing {len(rows)} ticks to {self.table_name}: {e}")
+        finally:
+            if self.db_conn is not None:
+                self.db_conn.close()
+
+        self.stats['batches'] += 1
+        self.stats['last_flush_rows'] = len(rows)
+        self.stats['last_flush_seconds'] = time.monotonic() - started_at
+        if saved:
+            self.stats['written'] += len(rows)
+        else:
+            self.stats['failed'] += len(rows)
+        return saved
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        return stats
+
+    def stop(self, timeout = 30):
+        """Stop the writer thread and flush every queued tick."""
+        if self.thread is None:
+            return True
+
+        self.stop_event.set()
+        self.thread.join(timeout)
+        stopped = not self.thread.is_alive()
+        if stopped:
+            self.thread = None
+        else:
+            self.logging.error(f"Tick writer did not stop within {timeout}s, {self.queue.qsize()} ticks pending")
+
+        self.logging.info(f"Tick writer stopped: {self.get_stats()}")
+        return stopped
@@ -15,6 +15,7 @@ from instrument import Instrument
 from  moving_averages import *
 from  candlestick_patterns import *
 from common import Util
+from indicator_registry import IndicatorRegistry
 
 
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG,
@@ -29,10 +30,9 @@ instrument = Instrument(token, is_index, setting, logging)
 instrument.load_historical_test_data()
 
 
-instrument.historical_data_5m["SMA-200"] = moving_average_close_200sma(instrument.historical_data_5m)
-instrument.historical_data_5m["SMA-20"] = moving_average_close_20sma(instrument.historical_data_5m)
-instrument.historical_data_5m["ATR"] = atr(instrument.historical_data_5m)
-instrument.historical_data_5m.drop(columns=['previous_close', 'high_low', 'high_close', 'low_close'], inplace=True)
+indicators = IndicatorRegistry(logging)
+instrument.historical_data_5m = indicators.apply(instrument.historical_data_5m, token, '5minute',
+                                                 ['SMA-200', 'SMA-20', 'ATR', 'shooting_star', 'is_hammer'])
 
 # instrument.historical_data_30m["SMA-9-h"] = moving_average_high_9sma(instrument.historical_data_30m)
 # instrument.historical_data_30m["SMA-9-l"] = moving_average_low_9sma(instrument.historical_data_30m)
@@ -43,10 +43,8 @@ instrument.historical_data_5m.drop(columns=['previous_close', 'high_low', 'high_
 df_5m = instrument.historical_data_5m
 df_30m = instrument.historical_data_30m
 
-df_5m["shooting_star"] = df_5m.apply(lambda row: is_shooting_star(row.name, df_5m), axis=1)
 # df_5m["is_bearish_engulfing"] = df_5m.apply(lambda row: is_bearish_engulfing(row.name, df_5m), axis=1)
 # df_5m["is_bearish_marubozu"] = df_5m.apply(lambda row: is_bearish_marubozu(row.name, df_5m), axis=1)
-df_5m["is_hammer"] = df_5m.apply(lambda row: is_hammer(row.name, df_5m), axis=1)
 # df_5m["is_bullish_engulfing"] = df_5m.apply(lambda row: is_bullish_engulfing(row.name, df_5m), axis=1)
 # df_5m["is_bullish_marubozu"] = df_5m.apply(lambda row: is_bullish_marubozu(row.name, df_5m), axis=1)
 